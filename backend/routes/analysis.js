@@ -2,11 +2,17 @@ const express = require('express');
 const router = express.Router();
 const Joi = require('joi');
 const axios = require('axios');
+const zlib = require('zlib');
+const { promisify } = require('util');
 const ecgAnalyzer = require('../utils/ecgAnalyzer');
 
 // ML Service URL (force IPv4)
 const ML_SERVICE_URL = process.env.ML_SERVICE_URL || 'http://127.0.0.1:5002';
 
+// Gzip request bodies sent to the ML service (it decompresses gzip/zstd uploads)
+const ML_SERVICE_GZIP = process.env.ML_SERVICE_GZIP === 'true';
+const gzip = promisify(zlib.gzip);
+
 // Configure axios to prefer IPv4
 axios.defaults.family = 4;
 
@@ -443,15 +449,22 @@ router.post('/hybrid/:sessionId', async (req, res) => {
     let mlAnalysis = null;
     try {
       console.log('Calling ML service for AI diagnosis...');
-      const mlResponse = await axios.post(`${ML_SERVICE_URL}/analyze`, {
+      const mlHeaders = {
+        'Content-Type': 'application/json'
+      };
+      let mlBody = JSON.stringify({
         sessionId: sessionId,
         ecgData: ecgData,
         sampleRate: 250
-      }, {
+      });
+      if (ML_SERVICE_GZIP) {
+        mlBody = await gzip(mlBody, { level: 1 });
+        mlHeaders['Content-Encoding'] = 'gzip';
+      }
+      
+      const mlResponse = await axios.post(`${ML_SERVICE_URL}/analyze`, mlBody, {
         timeout: 30000, // 30 second timeout
-        headers: {
-          'Content-Type': 'application/json'
-        },
+        headers: mlHeaders,
         family: 4 // Force IPv4 to avoid ::1 (IPv6) connection issues
       });
       
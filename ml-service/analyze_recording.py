@@ -0,0 +1,51 @@
+"""
+HeartWise Recording Analyzer
+Command-line analysis of on-disk recordings (.npy or raw int16/float32 files).
+Files are memory-mapped and streamed through ECGAnalyzer window by window,
+so multi-GB recordings never have to fit in memory.
+
+Usage:
+    python analyze_recording.py holter.npy --sample-rate 500
+    python analyze_recording.py holter.raw --sample-rate 250 --dtype int16 --output result.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import logging
+
+from ecg_analyzer import ECGAnalyzer
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze an on-disk ECG recording')
+    parser.add_argument('paths', nargs='+', help='.npy or raw sample files')
+    parser.add_argument('--sample-rate', type=int, default=250, help='sample rate in Hz')
+    parser.add_argument('--dtype', default='int16', choices=['int16', 'float32', 'float64'], help='sample type of raw files')
+    parser.add_argument('--lead', type=int, default=0, help='lead index for 2-D (leads, samples) .npy files')
+    parser.add_argument('--window-seconds', type=float, default=None, help='analysis window length')
+    parser.add_argument('--output', help='write results as JSON to this file instead of stdout')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    analyzer = ECGAnalyzer()
+
+    results = []
+    for path in args.paths:
+        started = time.perf_counter()
+        result = analyzer.analyze_file(path, args.sample_rate, args.dtype, args.lead, args.window_seconds)
+        result['file'] = path
+        result['elapsedSeconds'] = round(time.perf_counter() - started, 3)
+        results.append(result)
+
+    report = json.dumps(results if len(results) > 1 else results[0], indent=2, default=float)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
+
+    return 1 if any(result['analysis_type'] == 'error' for result in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,9 +3,12 @@ HeartWise ML Analysis Service
 Flask API for ECG classification using pre-trained models
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import numpy as np
+import os
+import time
+import atexit
 import logging
 from datetime import datetime
 
@@ -18,10 +21,186 @@ CORS(app)
 
 # Import analysis modules
 from ecg_analyzer import ECGAnalyzer
+from streaming_qrs import StreamSessions
+from batch_pool import BatchProcessPool
+from result_cache import AnalysisCache
+from instrumentation import StageTimer, stage_histograms
+from metrics import ServiceMetrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from micro_batcher import MicroBatcher, QueueFullError
+from job_queue import JobManager
+from json_ingest import parse_ecg_stream, decode_columnar
+from compression import (RequestDecompressionMiddleware, ResponseCompressor, CONTENT_ENCODING_KEY,
+                         DecompressionError, DecompressionLimitError)
+
+# gzip/zstd request bodies are decompressed while they are read
+app.wsgi_app = RequestDecompressionMiddleware(app.wsgi_app)
 
 # Initialize analyzer
 analyzer = ECGAnalyzer()
 
+# Process pool for batch analysis (inline unless BATCH_WORKERS > 1)
+batch_pool = BatchProcessPool()
+atexit.register(batch_pool.close)
+
+# Content-addressed result cache for repeated analyses of the same session
+result_cache = AnalysisCache()
+
+# Recordings longer than this are analyzed in chunked (memory-bounded) mode
+LONG_RECORDING_SECONDS = float(os.environ.get('LONG_RECORDING_SECONDS', 3600))
+
+# /analyze bodies at least this large are parsed incrementally instead of with get_json()
+STREAM_PARSE_MIN_BYTES = int(os.environ.get('STREAM_PARSE_MIN_BYTES', 1024 * 1024))
+
+# Optional gzip/zstd responses (RESPONSE_COMPRESSION)
+response_compressor = ResponseCompressor()
+
+# Sessions analyzed per chunk of a streamed (NDJSON) batch response
+BATCH_STREAM_CHUNK_SIZE = int(os.environ.get('BATCH_STREAM_CHUNK_SIZE', 16))
+
+# Most sliding windows one ?timelineWindow request may produce (24 h at a 10 s hop is 8,640)
+TIMELINE_MAX_WINDOWS = int(os.environ.get('TIMELINE_MAX_WINDOWS', 10000))
+
+def timeline_params(n_samples, sample_rate):
+    """
+    Optional sliding-window HR/HRV timeline (?timelineWindow=60&timelineHop=10, seconds)
+    Raises ValueError on a non-positive window or hop, or more than TIMELINE_MAX_WINDOWS windows
+    """
+    timeline_window = request.args.get('timelineWindow', type=float)
+    timeline_hop = request.args.get('timelineHop', type=float)
+    if 'timelineWindow' not in request.args:
+        return None, None
+    if timeline_window is None or ('timelineHop' in request.args and timeline_hop is None):
+        raise ValueError('timelineWindow and timelineHop must be numbers of seconds')
+    
+    n_windows = analyzer.timeline_window_count(n_samples / sample_rate, timeline_window, timeline_hop)
+    if n_windows > TIMELINE_MAX_WINDOWS:
+        raise ValueError(
+            f'Timeline would have {n_windows} windows, the limit is {TIMELINE_MAX_WINDOWS}; '
+            f'use a longer timelineHop'
+        )
+    return timeline_window, timeline_hop
+
+def analyze_cached(voltages, sample_rate, timer=None):
+    """
+    Run the analyzer through the result cache
+    Long recordings, or requests with ?mode=long, use chunked analysis
+    """
+    timeline_window, timeline_hop = timeline_params(len(voltages), sample_rate)
+    version = analyzer.VERSION
+    if timeline_window:
+        version = f"{version}:timeline:{timeline_window}:{timeline_hop}"
+    
+    if request.args.get('mode') == 'long' or len(voltages) > LONG_RECORDING_SECONDS * sample_rate:
+        return result_cache.get_or_compute(
+            voltages, sample_rate, f"{version}:long",
+            lambda: analyzer.analyze_long(
+                voltages, sample_rate, timer=timer,
+                timeline_window=timeline_window, timeline_hop=timeline_hop
+            )
+        )
+    
+    if micro_batcher.enabled and not timeline_window:
+        def compute():
+            with (timer or StageTimer()).stage('microbatch'):
+                return micro_batcher.analyze(voltages, sample_rate)
+    else:
+        def compute():
+            return analyzer.analyze(voltages, sample_rate, timer, timeline_window, timeline_hop)
+    
+    return result_cache.get_or_compute(voltages, sample_rate, version, compute)
+
+def request_timer():
+    """Stage timer for this request; the timings block is opt-in via ?timings=1 or X-Timings: 1"""
+    flag = request.args.get('timings') or request.headers.get('X-Timings') or ''
+    return StageTimer(enabled=flag.lower() in ('1', 'true', 'yes'))
+
+def wants_ndjson():
+    """Streamed batch results requested via ?stream=1 or Accept: application/x-ndjson"""
+    flag = request.args.get('stream') or ''
+    return flag.lower() in ('1', 'true', 'yes') or 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def ndjson_batch(signals, sample_rates, session_ids):
+    """
+    Yield one JSON line per session, a chunk at a time, as soon as each chunk is analyzed
+    Signals are released once analyzed, so memory shrinks as the response is written
+    """
+    for start in range(0, len(signals), BATCH_STREAM_CHUNK_SIZE):
+        end = min(start + BATCH_STREAM_CHUNK_SIZE, len(signals))
+        try:
+            results = batch_pool.analyze_batch(analyzer, signals[start:end], sample_rates[start:end])
+        except Exception as e:
+            logger.error(f"Error in streamed batch analysis: {str(e)}", exc_info=True)
+            results = [{'error': str(e)} for _ in range(start, end)]
+        
+        for index, result in enumerate(results, start=start):
+            signals[index] = None
+            result['sessionId'] = session_ids[index]
+            result['index'] = index
+            yield app.json.dumps(result) + '\n'
+
+def json_response(payload, timer):
+    """Serialize payload, adding the timings block when the request asked for it"""
+    with timer.stage('serialize'):
+        body = app.json.dumps(payload)
+    
+    if timer.enabled:
+        # Spliced in after serializing so the serialize stage itself can be reported
+        body = body[:-1] + ', "timings": ' + app.json.dumps(timer.to_dict()) + '}'
+        logger.info(f"Stage timings: {timer.summary()}")
+    
+    return app.response_class(body + '\n', mimetype='application/json')
+
+# Live streaming detectors, one per session (dropped after STREAM_IDLE_TIMEOUT_SECONDS idle)
+stream_sessions = StreamSessions()
+
+# Prometheus-style service metrics
+metrics = ServiceMetrics()
+metrics.register_gauge('queue_depth', 'Batch chunks waiting on worker processes', batch_pool.pending_tasks)
+metrics.register_gauge('stream_sessions', 'Open live streaming sessions', stream_sessions.active)
+
+# Micro-batching of concurrent /analyze requests (MICROBATCH_ENABLED)
+micro_batcher = MicroBatcher(analyzer, on_batch=metrics.microbatch_sizes.observe)
+metrics.register_gauge('microbatch_queue_depth', 'Requests waiting for a micro-batch', micro_batcher.queue_depth)
+atexit.register(micro_batcher.close)
+
+# Background jobs for large batches; chunks go through the batch pool
+jobs = JobManager(lambda signals, sample_rates: batch_pool.analyze_batch(analyzer, signals, sample_rates))
+metrics.register_gauge('jobs_queued', 'Analysis jobs waiting for a worker', jobs.queued)
+metrics.register_gauge('jobs_running', 'Analysis jobs in progress', jobs.running)
+
+def extract_sessions(sessions):
+    """Signals and sample rates of batch-style {"ecgData": [...], "sampleRate": 250} sessions"""
+    signals = [
+        np.fromiter((point['voltage_mv'] for point in session['ecgData']), dtype=analyzer.dtype, count=len(session['ecgData']))
+        for session in sessions
+    ]
+    sample_rates = [session.get('sampleRate', 250) for session in sessions]
+    return signals, sample_rates
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.response_status = 500
+    metrics.in_flight.inc()
+
+@app.after_request
+def capture_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.after_request
+def compress_response(response):
+    return response_compressor.compress(response, request.accept_encodings)
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    metrics.in_flight.dec()
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.observe_request(route, request.method, g.pop('response_status', 500), time.perf_counter() - started)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -29,9 +208,25 @@ def health_check():
         'status': 'healthy',
         'service': 'HeartWise ML Analysis',
         'timestamp': datetime.now().isoformat(),
-        'model_loaded': analyzer.is_model_loaded()
+        'model_loaded': analyzer.is_model_loaded(),
+        'model_status': analyzer.get_model_status(),
+        'ready': analyzer.is_ready()
     })
 
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: the analyzer can serve analyses (503 if a configured model failed to load)"""
+    ready = analyzer.is_ready()
+    return jsonify({
+        'status': 'ready' if ready else 'not_ready',
+        'model_status': analyzer.get_model_status()
+    }), 200 if ready else 503
+
 @app.route('/analyze', methods=['POST'])
 def analyze_ecg():
     """
@@ -47,6 +242,17 @@ def analyze_ecg():
         "sampleRate": 250
     }
     
+    or columnar (no per-sample keys):
+    {
+        "sessionId": "uuid",
+        "sampleRate": 250,
+        "startMs": 1700000000000,
+        "voltages": [0.5, 0.52, ...] | "<base64 samples>",
+        "sampleFormat": "float32" | "int16",   (base64 only, default float32)
+        "scale": 0.005,                         (optional, mV per count)
+        "timestamps": [0, 4, 4, ...]            (optional ms deltas from startMs)
+    }
+    
     Response:
     {
         "sessionId": "uuid",
@@ -61,33 +267,188 @@ def analyze_ecg():
     }
     """
     try:
-        data = request.get_json()
+        timer = request_timer()
         
-        if not data or 'ecgData' not in data:
+        # Large or compressed bodies: stream voltages straight into a NumPy buffer, no per-sample dicts
+        with timer.stage('parse'):
+            decompressed = CONTENT_ENCODING_KEY in request.environ
+            if request.is_json and (decompressed or (request.content_length or 0) >= STREAM_PARSE_MIN_BYTES):
+                try:
+                    data, voltages = parse_ecg_stream(request.stream, analyzer.dtype, size_hint=request.content_length)
+                except ValueError as e:
+                    return jsonify({'error': f'Invalid request body: {str(e)}'}), 400
+            else:
+                data, voltages = request.get_json(), None
+        
+        if not data or (voltages is None and 'ecgData' not in data and 'voltages' not in data):
             return jsonify({'error': 'Missing ecgData in request'}), 400
         
         session_id = data.get('sessionId', 'unknown')
-        ecg_data = data['ecgData']
-        sample_rate = data.get('sampleRate', 250)
-        
-        logger.info(f"Analyzing ECG session {session_id} with {len(ecg_data)} data points")
+        sample_rate = data.get('sampleRate')
         
         # Extract voltage values
-        voltages = [point['voltage_mv'] for point in ecg_data]
+        if voltages is None and 'ecgData' in data:
+            with timer.stage('extract'):
+                ecg_data = data['ecgData']
+                voltages = np.fromiter((point['voltage_mv'] for point in ecg_data), dtype=analyzer.dtype, count=len(ecg_data))
+        elif voltages is None:
+            # Columnar body: voltages array or base64 blob, optional timestamp deltas
+            with timer.stage('extract'):
+                try:
+                    voltages, inferred_rate = decode_columnar(data, analyzer.dtype)
+                except ValueError as e:
+                    return jsonify({'error': f'Invalid request body: {str(e)}'}), 400
+            sample_rate = sample_rate or inferred_rate
+        
+        sample_rate = sample_rate or 250
+        
+        logger.info(f"Analyzing ECG session {session_id} with {voltages.size} data points")
         
         # Run analysis
-        result = analyzer.analyze(voltages, sample_rate)
+        metrics.observe_samples(voltages.size)
+        result = analyze_cached(voltages, sample_rate, timer)
         result['sessionId'] = session_id
         result['timestamp'] = datetime.now().isoformat()
         
         logger.info(f"Analysis complete: {result['classification']} (confidence: {result['confidence']:.2f})")
         
-        return jsonify(result)
+        return json_response(result, timer)
         
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except (DecompressionError, DecompressionLimitError) as e:
+        return jsonify({'error': e.description}), e.code
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error analyzing ECG: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+# Sample formats accepted by /analyze/binary (little-endian)
+BINARY_SAMPLE_FORMATS = {
+    'float32': np.dtype('<f4'),
+    'int16': np.dtype('<i2')
+}
+
+@app.route('/analyze/binary', methods=['POST'])
+def analyze_ecg_binary():
+    """
+    Analyze ECG data sent as raw little-endian samples
+    
+    Request:
+        Content-Type: application/octet-stream
+        Body: float32 or int16 samples, little-endian
+        X-Session-Id / ?sessionId=   session id
+        X-Sample-Rate / ?sampleRate= sample rate in Hz (default 250)
+        X-Sample-Format / ?format=   "float32" (default) or "int16"
+    
+    Response: same as /analyze
+    """
+    try:
+        timer = request_timer()
+        
+        session_id = request.headers.get('X-Session-Id') or request.args.get('sessionId', 'unknown')
+        sample_rate = int(request.headers.get('X-Sample-Rate') or request.args.get('sampleRate', 250))
+        sample_format = request.headers.get('X-Sample-Format') or request.args.get('format', 'float32')
+        
+        dtype = BINARY_SAMPLE_FORMATS.get(sample_format)
+        if dtype is None:
+            return jsonify({'error': f'Unsupported sample format: {sample_format}'}), 400
+        
+        with timer.stage('parse'):
+            body = request.get_data(cache=False)
+        if not body:
+            return jsonify({'error': 'Missing ECG samples in request body'}), 400
+        if len(body) % dtype.itemsize != 0:
+            return jsonify({'error': f'Body length is not a multiple of {dtype.itemsize} bytes'}), 400
+        
+        # Zero-copy view over the request body
+        voltages = np.frombuffer(body, dtype=dtype)
+        
+        logger.info(f"Analyzing ECG session {session_id} with {voltages.size} {sample_format} samples")
+        
+        metrics.observe_samples(voltages.size)
+        result = analyze_cached(voltages, sample_rate, timer)
+        result['sessionId'] = session_id
+        result['timestamp'] = datetime.now().isoformat()
+        
+        logger.info(f"Analysis complete: {result['classification']} (confidence: {result['confidence']:.2f})")
+        
+        return json_response(result, timer)
+        
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except (DecompressionError, DecompressionLimitError) as e:
+        return jsonify({'error': e.description}), e.code
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error analyzing binary ECG: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/analyze/multilead', methods=['POST'])
+def analyze_ecg_multilead():
+    """
+    Analyze a multi-lead (e.g. 12-lead) recording in one call
+    
+    Request body, either leads keyed by name:
+    {
+        "sessionId": "uuid",
+        "sampleRate": 500,
+        "leads": {"I": [0.5, ...], "II": [...], ...}
+    }
+    or ecg_data_points rows with a lead column:
+    {
+        "sessionId": "uuid",
+        "sampleRate": 500,
+        "ecgData": [{"timestamp_ms": 1000, "voltage_mv": 0.5, "lead": "II"}, ...]
+    }
+    
+    Response: same as /analyze, plus details.leads (per-lead quality) and
+    details.consensusRPeaks
+    """
+    try:
+        timer = request_timer()
+        
+        with timer.stage('parse'):
+            data = request.get_json()
+        
+        if not data or ('leads' not in data and 'ecgData' not in data):
+            return jsonify({'error': 'Missing leads or ecgData in request'}), 400
+        
+        session_id = data.get('sessionId', 'unknown')
+        sample_rate = data.get('sampleRate', 250)
+        
+        with timer.stage('extract'):
+            if 'leads' in data:
+                leads = data['leads']
+            else:
+                leads = {}
+                for point in data['ecgData']:
+                    leads.setdefault(point.get('lead', 'I'), []).append(point['voltage_mv'])
+            
+            lengths = {len(voltages) for voltages in leads.values()}
+            if len(lengths) != 1:
+                return jsonify({'error': 'All leads must have the same number of samples'}), 400
+            
+            lead_names = list(leads.keys())
+            signals = np.array([leads[name] for name in lead_names], dtype=analyzer.dtype)
+        
+        logger.info(f"Analyzing ECG session {session_id} with {len(lead_names)} leads x {signals.shape[1]} samples")
+        
+        metrics.observe_samples(signals.size)
+        result = analyzer.analyze_multilead(signals, sample_rate, lead_names, timer)
+        result['sessionId'] = session_id
+        result['timestamp'] = datetime.now().isoformat()
+        
+        return json_response(result, timer)
+        
+    except (DecompressionError, DecompressionLimitError) as e:
+        return jsonify({'error': e.description}), e.code
+    except Exception as e:
+        logger.error(f"Error analyzing multi-lead ECG: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/batch-analyze', methods=['POST'])
 def batch_analyze():
     """
@@ -100,28 +461,202 @@ def batch_analyze():
             ...
         ]
     }
+    
+    With ?stream=1 or Accept: application/x-ndjson the response is
+    application/x-ndjson: one result per line (with sessionId and index),
+    written as soon as that session's chunk is analyzed
     """
     try:
-        data = request.get_json()
+        timer = request_timer()
+        
+        with timer.stage('parse'):
+            data = request.get_json()
         sessions = data.get('sessions', [])
         
-        results = []
-        for session in sessions:
-            voltages = [point['voltage_mv'] for point in session['ecgData']]
-            result = analyzer.analyze(voltages, session.get('sampleRate', 250))
+        with timer.stage('extract'):
+            signals, sample_rates = extract_sessions(sessions)
+        
+        metrics.batch_sizes.observe(len(signals))
+        metrics.observe_samples(sum(voltages.size for voltages in signals), len(signals))
+        
+        if wants_ndjson():
+            session_ids = [session.get('sessionId', 'unknown') for session in sessions]
+            del data, sessions
+            return app.response_class(
+                ndjson_batch(signals, sample_rates, session_ids),
+                mimetype='application/x-ndjson',
+                headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'}
+            )
+        
+        results = batch_pool.analyze_batch(analyzer, signals, sample_rates, timer)
+        for session, result in zip(sessions, results):
             result['sessionId'] = session.get('sessionId', 'unknown')
-            results.append(result)
         
-        return jsonify({
+        return json_response({
             'results': results,
             'count': len(results),
             'timestamp': datetime.now().isoformat()
-        })
+        }, timer)
         
+    except (DecompressionError, DecompressionLimitError) as e:
+        return jsonify({'error': e.description}), e.code
     except Exception as e:
         logger.error(f"Error in batch analysis: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a batch analysis to run in the background
+    
+    Request body: same as /batch-analyze
+    
+    Response (202):
+    {
+        "jobId": "3f2a...",
+        "status": "queued",
+        "total": 400,
+        "statusUrl": "/jobs/3f2a..."
+    }
+    """
+    try:
+        data = request.get_json()
+        sessions = (data or {}).get('sessions') or []
+        if not sessions:
+            return jsonify({'error': 'Missing sessions in request'}), 400
+        
+        signals, sample_rates = extract_sessions(sessions)
+        session_ids = [session.get('sessionId', 'unknown') for session in sessions]
+        
+        job = jobs.submit(signals, sample_rates, session_ids)
+        metrics.batch_sizes.observe(len(signals))
+        metrics.observe_samples(sum(voltages.size for voltages in signals), len(signals))
+        
+        return jsonify({
+            'jobId': job.id,
+            'status': job.status,
+            'total': job.total,
+            'statusUrl': f'/jobs/{job.id}'
+        }), 202
+        
+    except (DecompressionError, DecompressionLimitError) as e:
+        return jsonify({'error': e.description}), e.code
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Error submitting job: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Status of all jobs that have not expired (without results)"""
+    return jsonify({
+        'jobs': [job.to_dict(jobs.result_ttl, include_results=False) for job in jobs.all_jobs()],
+        'counts': jobs.counts()
+    })
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Progress and results of a job
+    Results finished so far are returned in session order; poll with
+    ?offset=<completed> to only fetch new ones, or ?results=0 for status only
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    
+    include_results = request.args.get('results', '1').lower() not in ('0', 'false', 'no')
+    offset = request.args.get('offset', 0, type=int)
+    return json_response(job.to_dict(jobs.result_ttl, include_results, offset), StageTimer())
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a job; a running job stops after its current chunk"""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    
+    return jsonify(job.to_dict(jobs.result_ttl, include_results=False))
+
+@app.route('/stream/<session_id>', methods=['POST'])
+def stream_push(session_id):
+    """
+    Push a chunk of live samples for a session
+    
+    Request body:
+    {
+        "samples": [0.5, 0.6, ...],
+        "sampleRate": 250
+    }
+    
+    Response:
+    {
+        "sessionId": "uuid",
+        "rPeaks": [1250, 1452],
+        "samplesProcessed": 5000,
+        "heartRate": 74.3
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'samples' not in data:
+            return jsonify({'error': 'Missing samples in request'}), 400
+        
+        sample_rate = data.get('sampleRate', 250)
+        
+        r_peaks, samples_processed, heart_rate = stream_sessions.push(session_id, data['samples'], sample_rate)
+        metrics.observe_samples(len(data['samples']), 0)
+        
+        return jsonify({
+            'sessionId': session_id,
+            'rPeaks': [int(peak) for peak in r_peaks],
+            'samplesProcessed': samples_processed,
+            'heartRate': round(heart_rate, 1)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in stream push: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/stream/<session_id>', methods=['DELETE'])
+def stream_close(session_id):
+    """Close a live streaming session"""
+    detector = stream_sessions.close(session_id)
+    if detector is None:
+        return jsonify({'error': 'Unknown stream session'}), 404
+    
+    return jsonify({
+        'sessionId': session_id,
+        'samplesProcessed': detector.samples_seen,
+        'qrsCount': detector.peak_count
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition of request, stage, cache and process metrics"""
+    cache = result_cache.get_stats() if result_cache.enabled else None
+    return app.response_class(metrics.render(cache), mimetype=None, content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/stats/timings', methods=['GET'])
+def timing_stats():
+    """Per-stage wall/CPU time histograms aggregated since startup"""
+    return jsonify(stage_histograms.snapshot())
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Result cache hit, miss and eviction counters"""
+    return jsonify(result_cache.get_stats())
+
+@app.route('/cache', methods=['DELETE'])
+def cache_clear():
+    """Drop all cached analysis results"""
+    result_cache.clear()
+    return jsonify(result_cache.get_stats())
+
 @app.route('/models', methods=['GET'])
 def get_models():
     """Get information about loaded models"""
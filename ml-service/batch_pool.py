@@ -0,0 +1,196 @@
+"""
+Batch Process Pool
+Splits batch analyses across worker processes. Signals are copied once into
+a shared memory block and workers read them in place instead of receiving
+pickled arrays.
+
+Configuration (environment variables):
+- BATCH_WORKERS: number of worker processes (0 or 1 runs inline, default 0)
+- BATCH_CHUNK_SIZE: sessions handed to a worker per task (default 16)
+- BATCH_MIN_SESSIONS: smaller batches run inline (default 8)
+- BATCH_BLAS_THREADS: BLAS/OpenMP threads per worker (default 1)
+- BATCH_START_METHOD: multiprocessing start method (default spawn)
+
+With BATCH_START_METHOD=fork, workers reuse the analyzer of the process that
+started the pool, so a model loaded beforehand (MODEL_PRELOAD=true) is shared
+copy-on-write instead of being loaded again by every worker.
+"""
+
+import os
+import logging
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from instrumentation import StageTimer
+
+logger = logging.getLogger(__name__)
+
+BLAS_THREAD_VARIABLES = (
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'BLIS_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS'
+)
+
+# Analyzer owned by each worker process
+_worker_analyzer = None
+
+# Analyzer of the process starting a fork pool; forked workers inherit it
+_parent_analyzer = None
+
+def _init_worker(blas_threads):
+    """Set up the per-process analyzer and cap BLAS threads"""
+    global _worker_analyzer
+
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(blas_threads)
+    except ImportError:
+        pass
+
+    if _parent_analyzer is not None:
+        _worker_analyzer = _parent_analyzer
+        return
+
+    from ecg_analyzer import ECGAnalyzer
+    _worker_analyzer = ECGAnalyzer()
+
+def _analyze_chunk(shm_name, descriptors, dtype='<f8'):
+    """
+    Analyze sessions stored in a shared memory block
+    descriptors: list of (offset, length, sample_rate), offsets in items of dtype
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        dtype = np.dtype(dtype)
+        buffer = np.ndarray((shm.size // dtype.itemsize,), dtype=dtype, buffer=shm.buf)
+        signals = [buffer[offset:offset + length] for offset, length, _ in descriptors]
+        sample_rates = [sample_rate for _, _, sample_rate in descriptors]
+
+        results = _worker_analyzer.analyze_batch(signals, sample_rates)
+
+        del signals, buffer
+        return results
+    finally:
+        shm.close()
+
+class BatchProcessPool:
+    """
+    Process pool backend for ECGAnalyzer.analyze_batch
+    Results are gathered in request order
+    """
+
+    def __init__(self, workers=None, chunk_size=None, min_sessions=None,
+                 blas_threads=None, start_method=None):
+        self.workers = workers if workers is not None else int(os.environ.get('BATCH_WORKERS', 0))
+        self.chunk_size = chunk_size or int(os.environ.get('BATCH_CHUNK_SIZE', 16))
+        self.min_sessions = min_sessions if min_sessions is not None else int(os.environ.get('BATCH_MIN_SESSIONS', 8))
+        self.blas_threads = blas_threads or int(os.environ.get('BATCH_BLAS_THREADS', 1))
+        self.start_method = start_method or os.environ.get('BATCH_START_METHOD', 'spawn')
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 1
+
+    def pending_tasks(self):
+        """Chunks submitted to workers and not yet collected"""
+        return self._pending
+
+    def _add_pending(self, amount):
+        with self._pending_lock:
+            self._pending += amount
+
+    def _get_pool(self, analyzer):
+        """Start worker processes on first use"""
+        global _parent_analyzer
+
+        if self._pool is not None:
+            return self._pool
+        with self._pool_lock:
+            if self._pool is None:
+                _parent_analyzer = analyzer if self.start_method == 'fork' else None
+
+                # Spawned workers inherit the environment, so BLAS limits apply before numpy loads
+                saved = {name: os.environ.get(name) for name in BLAS_THREAD_VARIABLES}
+                os.environ.update({name: str(self.blas_threads) for name in BLAS_THREAD_VARIABLES})
+                try:
+                    context = multiprocessing.get_context(self.start_method)
+                    self._pool = context.Pool(self.workers, initializer=_init_worker, initargs=(self.blas_threads,))
+                finally:
+                    for name, value in saved.items():
+                        if value is None:
+                            os.environ.pop(name, None)
+                        else:
+                            os.environ[name] = value
+
+                logger.info(f"Started batch process pool with {self.workers} workers ({self.start_method})")
+
+            return self._pool
+
+    def analyze_batch(self, analyzer, signals, sample_rates, timer=None):
+        """
+        Analyze sessions across worker processes
+        Small batches, or a disabled pool, run inline on the given analyzer
+        """
+        if not self.enabled or len(signals) < self.min_sessions:
+            return analyzer.analyze_batch(signals, sample_rates, timer)
+
+        timer = timer or StageTimer()
+        with timer.stage('process_pool'):
+            return self._analyze_in_pool(analyzer, signals, sample_rates)
+
+    def _analyze_in_pool(self, analyzer, signals, sample_rates):
+        """Fan chunks out to workers through shared memory, in the analyzer's working dtype"""
+        dtype = np.dtype(analyzer.dtype)
+        arrays = [np.asarray(ecg_signal, dtype=dtype).ravel() for ecg_signal in signals]
+
+        # Lay the signals out back to back in one shared block
+        offsets = np.concatenate(([0], np.cumsum([array.size for array in arrays])))
+        total = int(offsets[-1])
+        shm = shared_memory.SharedMemory(create=True, size=max(total, 1) * dtype.itemsize)
+
+        try:
+            buffer = np.ndarray((total,), dtype=dtype, buffer=shm.buf)
+            for array, offset in zip(arrays, offsets):
+                buffer[offset:offset + array.size] = array
+            del buffer
+
+            # Keep sessions of the same shape together so workers can vectorize them
+            order = sorted(range(len(arrays)), key=lambda i: (sample_rates[i], arrays[i].size))
+            chunks = [order[i:i + self.chunk_size] for i in range(0, len(order), self.chunk_size)]
+
+            pending = []
+            for chunk in chunks:
+                descriptors = [(int(offsets[i]), int(arrays[i].size), sample_rates[i]) for i in chunk]
+                pending.append(self._get_pool(analyzer).apply_async(_analyze_chunk, (shm.name, descriptors, dtype.str)))
+            self._add_pending(len(pending))
+
+            results = [None] * len(arrays)
+            for chunk, task in zip(chunks, pending):
+                try:
+                    for index, result in zip(chunk, task.get()):
+                        results[index] = result
+                finally:
+                    self._add_pending(-1)
+
+            return results
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def close(self):
+        """Stop worker processes"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
@@ -0,0 +1,183 @@
+"""
+Ingest Benchmark
+Compares the two ways /analyze turns a JSON body into a voltage array:
+get_json()-style json.loads plus np.fromiter over the ecgData dicts, and the
+incremental parse_ecg_stream parser. Reports parse throughput and peak
+traced memory for synthetic recordings of several lengths, and checks both
+paths produce the same samples, with voltages sent as numbers (devices) or as
+numeric strings (the backend, which reads DECIMAL columns through node-postgres).
+A nested "ecgData" key before the real one must not be picked up either.
+
+It also posts the payload the backend's /hybrid route sends (string voltages,
+up to its 50,000-point limit) to /analyze plain, gzip and zstd through the
+Flask test client. Every variant must return 200 with the same result.
+
+Usage:
+    python benchmarks/ingest_benchmark.py
+    python benchmarks/ingest_benchmark.py --durations 60 600 3600 --sample-rate 250 --output ingest.json
+"""
+
+import io
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from json_ingest import parse_ecg_stream
+from synthetic_ecg import generate_ecg
+
+VOLTAGE_FORMATS = ('number', 'string')
+
+def make_body(duration_s, sample_rate, voltage_format='number', meta=None):
+    """/analyze request body in the per-sample object format"""
+    ecg_signal, _ = generate_ecg(duration_s, sample_rate, seed=int(duration_s))
+    if voltage_format == 'string':
+        # DECIMAL(10,6) as node-postgres returns it
+        voltages = [f'{float(value):.6f}' for value in ecg_signal]
+    else:
+        voltages = [round(float(value), 3) for value in ecg_signal]
+    points = [
+        {'timestamp_ms': round(index * 1000 / sample_rate), 'voltage_mv': voltage}
+        for index, voltage in enumerate(voltages)
+    ]
+    body = {'sessionId': 'benchmark', 'sampleRate': sample_rate}
+    if meta is not None:
+        body['meta'] = meta
+    body['ecgData'] = points
+    return json.dumps(body).encode()
+
+def parse_dicts(body):
+    data = json.loads(body)
+    ecg_data = data['ecgData']
+    return np.fromiter((point['voltage_mv'] for point in ecg_data), dtype=float, count=len(ecg_data))
+
+def parse_streaming(body):
+    _, voltages = parse_ecg_stream(io.BytesIO(body), size_hint=len(body))
+    return voltages
+
+def nested_key_identical(sample_rate):
+    """A body whose metadata holds its own ecgData parses to the real samples"""
+    body = make_body(10, sample_rate, meta={'ecgData': []})
+    return bool(np.array_equal(parse_dicts(body), parse_streaming(body)))
+
+def measure(parse, body, repeat):
+    """Best wall time over repeat runs, then peak traced memory of one more run"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        voltages = parse(body)
+        best = min(best, time.perf_counter() - started)
+        del voltages
+
+    tracemalloc.start()
+    try:
+        voltages = parse(body)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, voltages
+
+def backend_body(points, sample_rate):
+    """/hybrid's ML request: DB rows with DECIMAL voltages as strings, plus a few plain numbers"""
+    ecg_signal, _ = generate_ecg(points / sample_rate, sample_rate, seed=points)
+    ecg_data = [
+        {
+            'timestamp_ms': round(index * 1000 / sample_rate),
+            'voltage_mv': f'{float(value):.6f}' if index % 1000 else round(float(value), 6)
+        }
+        for index, value in enumerate(ecg_signal[:points])
+    ]
+    return json.dumps({'sessionId': 'benchmark', 'ecgData': ecg_data, 'sampleRate': sample_rate}).encode()
+
+def compressed_request_check(sample_rate, point_counts=(2000, 50000)):
+    """Backend-shaped /analyze bodies give the same 200 response plain and compressed"""
+    os.environ.setdefault('CACHE_MAX_BYTES', '0')
+    from app import app
+    from compression import zstandard
+
+    encoders = {'identity': lambda body: body, 'gzip': lambda body: gzip.compress(body, compresslevel=1)}
+    if zstandard is not None:
+        encoders['zstd'] = zstandard.ZstdCompressor().compress
+
+    client = app.test_client()
+    ok = True
+    for points in point_counts:
+        body = backend_body(points, sample_rate)
+        responses = {}
+        for encoding, encode in encoders.items():
+            headers = {} if encoding == 'identity' else {'Content-Encoding': encoding}
+            response = client.post('/analyze', data=encode(body), content_type='application/json', headers=headers)
+            result = response.get_json() or {}
+            result.pop('timestamp', None)
+            responses[encoding] = (response.status_code, result)
+
+        statuses = {encoding: status for encoding, (status, _) in responses.items()}
+        identical = all(result == responses['identity'][1] for _, result in responses.values())
+        passed = identical and all(status == 200 for status in statuses.values())
+        ok = ok and passed
+        print(f"backend body {points} points ({len(body) / 1e6:.1f} MB): "
+              f"{' '.join(f'{encoding} {status}' for encoding, status in statuses.items())}"
+              f"{'' if passed else '  FAILED'}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON ingest of ecgData bodies')
+    parser.add_argument('--durations', type=float, nargs='+', default=[60, 600, 3600], help='recording lengths in seconds')
+    parser.add_argument('--sample-rate', type=int, default=250, help='sample rate in Hz')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    results = []
+    cases = [(duration, voltage_format) for duration in args.durations for voltage_format in VOLTAGE_FORMATS]
+    for duration, voltage_format in cases:
+        body = make_body(duration, args.sample_rate, voltage_format)
+        row = {
+            'duration_s': duration,
+            'voltage_format': voltage_format,
+            'samples': int(duration * args.sample_rate),
+            'body_bytes': len(body)
+        }
+
+        voltages = {}
+        for name, parse in (('dicts', parse_dicts), ('streaming', parse_streaming)):
+            seconds, peak, voltages[name] = measure(parse, body, args.repeat)
+            row[name] = {
+                'seconds': round(seconds, 4),
+                'mb_per_second': round(len(body) / seconds / 1e6, 1),
+                'peak_bytes': peak
+            }
+        row['identical'] = bool(np.array_equal(voltages['dicts'], voltages['streaming']))
+        results.append(row)
+
+        print(f"{duration:>7g}s {voltage_format:6s} ({len(body) / 1e6:7.1f} MB): "
+              f"dicts {row['dicts']['seconds']:.3f}s / {row['dicts']['peak_bytes'] / 1e6:.1f} MB peak, "
+              f"streaming {row['streaming']['seconds']:.3f}s / {row['streaming']['peak_bytes'] / 1e6:.1f} MB peak"
+              f"{'' if row['identical'] else '  MISMATCH'}")
+
+    nested_ok = nested_key_identical(args.sample_rate)
+    print(f"nested ecgData key: {'ok' if nested_ok else 'MISMATCH'}")
+    compressed_ok = compressed_request_check(args.sample_rate)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'sample_rate': args.sample_rate,
+                'results': results,
+                'nested_key_identical': nested_ok,
+                'compressed_requests_ok': compressed_ok
+            }, f, indent=2)
+
+    return 0 if nested_ok and compressed_ok and all(row['identical'] for row in results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Pipeline Benchmark
+Times every ECGAnalyzer stage and the full pipeline on deterministic synthetic
+ECG, across signal lengths, sample rates and batch sizes. Results are written
+as JSON and compared against a stored baseline.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py --preset quick --output results.json
+    python benchmarks/pipeline_benchmark.py --preset quick --save-baseline
+    python benchmarks/pipeline_benchmark.py --preset quick --threshold 0.2   # exits 1 on regression
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+import numpy as np
+import scipy
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from ecg_analyzer import ECGAnalyzer
+from synthetic_ecg import generate_ecg, generate_batch
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+PRESETS = {
+    'quick': {
+        'durations': [10, 60, 600],
+        'sample_rates': [250],
+        'batch_sizes': [1, 10, 100]
+    },
+    'standard': {
+        'durations': [10, 60, 600, 3600],
+        'sample_rates': [125, 250, 500, 1000],
+        'batch_sizes': [1, 10, 100, 1000]
+    },
+    'full': {
+        'durations': [10, 60, 600, 3600, 86400],
+        'sample_rates': [125, 250, 500, 1000],
+        'batch_sizes': [1, 10, 100, 1000]
+    }
+}
+
+def time_call(func, repeat, min_repeat_seconds=0.2):
+    """Run func repeat times (fewer for slow calls); return wall and CPU timings"""
+    wall, cpu = [], []
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        func()
+        wall.append(time.perf_counter() - wall_start)
+        cpu.append(time.process_time() - cpu_start)
+        if wall[-1] > min_repeat_seconds * 10:
+            break
+    return {
+        'median_s': statistics.median(wall),
+        'min_s': min(wall),
+        'cpu_median_s': statistics.median(cpu),
+        'repeats': len(wall)
+    }
+
+def bench_stages(analyzer, duration, sample_rate, repeat):
+    """Each stage and the full pipeline on one signal"""
+    ecg, _ = generate_ecg(duration, sample_rate, irregularity=0.05, seed=int(duration) + sample_rate)
+    r_peaks = analyzer.detect_qrs_pan_tompkins(ecg, sample_rate)
+    heart_rate, rr_intervals = analyzer.calculate_heart_rate(r_peaks, sample_rate)
+
+    stages = {
+        'preprocess': lambda: analyzer.preprocess(ecg, sample_rate),
+        'detect_qrs_pan_tompkins': lambda: analyzer.detect_qrs_pan_tompkins(ecg, sample_rate),
+        'calculate_hrv': lambda: analyzer.calculate_hrv(rr_intervals),
+        'detect_arrhythmias': lambda: analyzer.detect_arrhythmias(heart_rate, rr_intervals),
+        'analyze': lambda: analyzer.analyze(ecg, sample_rate)
+    }
+
+    results = []
+    for stage, func in stages.items():
+        timing = time_call(func, repeat)
+        timing.update({
+            'stage': stage,
+            'duration_s': duration,
+            'sample_rate': sample_rate,
+            'batch_size': 1,
+            'samples': int(ecg.size),
+            'samples_per_s': ecg.size / timing['median_s'] if timing['median_s'] > 0 else None
+        })
+        results.append(timing)
+    return results
+
+def bench_batches(analyzer, batch_size, duration, sample_rate, repeat):
+    """Per-session loop versus analyze_batch"""
+    signals = generate_batch(batch_size, duration, sample_rate, seed=batch_size)
+    sample_rates = [sample_rate] * batch_size
+
+    stages = {
+        'analyze_loop': lambda: [analyzer.analyze(ecg, sample_rate) for ecg in signals],
+        'analyze_batch': lambda: analyzer.analyze_batch(signals, sample_rates)
+    }
+
+    results = []
+    for stage, func in stages.items():
+        timing = time_call(func, repeat)
+        samples = sum(ecg.size for ecg in signals)
+        timing.update({
+            'stage': stage,
+            'duration_s': duration,
+            'sample_rate': sample_rate,
+            'batch_size': batch_size,
+            'samples': int(samples),
+            'samples_per_s': samples / timing['median_s'] if timing['median_s'] > 0 else None
+        })
+        results.append(timing)
+    return results
+
+def result_key(result):
+    return f"{result['stage']}|{result['duration_s']:g}|{result['sample_rate']}|{result['batch_size']}"
+
+def compare(results, baseline, threshold):
+    """Regressions where the median is more than threshold slower than the baseline"""
+    reference = {result_key(result): result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        previous = reference.get(result_key(result))
+        if previous is None or previous['median_s'] <= 0:
+            continue
+        ratio = result['median_s'] / previous['median_s']
+        result['baseline_median_s'] = previous['median_s']
+        result['ratio'] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append(result)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ECGAnalyzer pipeline stages')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    parser.add_argument('--durations', type=float, nargs='+', help='signal lengths in seconds')
+    parser.add_argument('--sample-rates', type=int, nargs='+', help='sample rates in Hz')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', help='sessions per batch')
+    parser.add_argument('--batch-duration', type=float, default=10, help='length of each batched session (s)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown before failing (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    preset = PRESETS[args.preset]
+    durations = args.durations or preset['durations']
+    sample_rates = args.sample_rates or preset['sample_rates']
+    batch_sizes = args.batch_sizes or preset['batch_sizes']
+
+    analyzer = ECGAnalyzer()
+    results = []
+
+    for sample_rate in sample_rates:
+        for duration in durations:
+            print(f"stages: {duration:g}s @ {sample_rate} Hz", file=sys.stderr)
+            results.extend(bench_stages(analyzer, duration, sample_rate, args.repeat))
+
+        for batch_size in batch_sizes:
+            print(f"batch: {batch_size} x {args.batch_duration:g}s @ {sample_rate} Hz", file=sys.stderr)
+            results.extend(bench_batches(analyzer, batch_size, args.batch_duration, sample_rate, args.repeat))
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'preset': args.preset,
+            'analyzer_version': ECGAnalyzer.VERSION,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count()
+        },
+        'results': results
+    }
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        report['regressions'] = [result_key(result) for result in regressions]
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    for result in results:
+        ratio = f" x{result['ratio']:.2f}" if 'ratio' in result else ''
+        print(f"{result_key(result):55s} {result['median_s'] * 1000:10.2f} ms{ratio}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:", file=sys.stderr)
+        for result in regressions:
+            print(f"  {result_key(result)}: x{result['ratio']:.2f}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
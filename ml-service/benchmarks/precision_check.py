@@ -0,0 +1,224 @@
+"""
+Precision Agreement Check
+Runs the same synthetic recordings through float64 and float32 analyzers and
+checks that R-peak positions, heart rate and HRV agree within tolerance, for
+single, batch, long and multi-lead analysis. Also measures peak memory of a
+large batch and of a one-hour recording in each mode (inputs already in the
+working dtype), and sends one request per endpoint to the Flask app in float32
+mode to check every response serializes. Exits 1 on any disagreement, failed
+request, or float32 run that does not use less memory than float64, so it can
+gate CI.
+
+Usage:
+    python benchmarks/precision_check.py
+    python benchmarks/precision_check.py --durations 10 60 600 --sample-rates 250 500 --output precision.json
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import tracemalloc
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from ecg_analyzer import ECGAnalyzer
+from synthetic_ecg import generate_ecg, generate_batch
+
+# R-peaks may move by one sample; rates and HRV must agree closely
+PEAK_TOLERANCE_SAMPLES = 1
+HEART_RATE_TOLERANCE_BPM = 0.5
+HRV_RELATIVE_TOLERANCE = 0.02
+HRV_ABSOLUTE_TOLERANCE = 1.0
+
+def peak_positions(analyzer, ecg_signal, sample_rate):
+    """Mapped R-peak indices through the same stages analyze() runs"""
+    signal_array = np.asarray(ecg_signal, dtype=analyzer.dtype)
+    filtered = analyzer.preprocess(signal_array, sample_rate)
+    integrated = analyzer.integrate(filtered, sample_rate)
+    return analyzer.find_r_peaks(integrated, sample_rate), integrated.dtype
+
+def compare_results(reference, candidate):
+    """List of disagreements between two analysis results"""
+    problems = []
+    if reference['classification'] != candidate['classification']:
+        problems.append(f"classification {reference['classification']} != {candidate['classification']}")
+
+    ref, cand = reference['details'], candidate['details']
+    if ref['qrsCount'] != cand['qrsCount']:
+        problems.append(f"qrsCount {ref['qrsCount']} != {cand['qrsCount']}")
+    if abs(ref['heartRate'] - cand['heartRate']) > HEART_RATE_TOLERANCE_BPM:
+        problems.append(f"heartRate {ref['heartRate']} != {cand['heartRate']}")
+    for key, value in ref['hrv'].items():
+        limit = max(HRV_ABSOLUTE_TOLERANCE, abs(value) * HRV_RELATIVE_TOLERANCE)
+        if abs(value - cand['hrv'][key]) > limit:
+            problems.append(f"{key} {value} != {cand['hrv'][key]}")
+    return problems
+
+def compare_peaks(reference, candidate):
+    if reference.size != candidate.size:
+        return [f"{reference.size} R-peaks != {candidate.size}"]
+    shift = int(np.max(np.abs(reference - candidate))) if reference.size else 0
+    return [f"R-peaks moved by up to {shift} samples"] if shift > PEAK_TOLERANCE_SAMPLES else []
+
+def peak_memory(func):
+    """Peak traced allocation of func() in bytes"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def endpoint_cases(ecg_signal, sample_rate):
+    """One request per endpoint against the app in float32 mode; returns (endpoint, problems) pairs"""
+    os.environ['ANALYSIS_PRECISION'] = 'float32'
+    import app as service
+    client = service.app.test_client()
+
+    voltages = [float(value) for value in ecg_signal]
+    points = [{'timestamp_ms': round(index * 1000 / sample_rate), 'voltage_mv': value} for index, value in enumerate(voltages)]
+    sessions = [{'sessionId': str(index), 'sampleRate': sample_rate, 'ecgData': points} for index in range(3)]
+    samples = np.asarray(ecg_signal, dtype='<f4').tobytes()
+
+    requests = [
+        ('/analyze', {'json': {'sessionId': 'check', 'sampleRate': sample_rate, 'ecgData': points}}),
+        ('/analyze?mode=long&timelineWindow=10', {'json': {'sampleRate': sample_rate, 'ecgData': points}}),
+        ('/analyze (columnar)', {'json': {'sampleRate': sample_rate, 'voltages': base64.b64encode(samples).decode()}}),
+        ('/analyze/binary', {'data': samples, 'content_type': 'application/octet-stream',
+                             'headers': {'X-Sample-Rate': str(sample_rate)}}),
+        ('/analyze/multilead', {'json': {'sampleRate': sample_rate, 'leads': {'I': voltages, 'II': voltages}}}),
+        ('/batch-analyze', {'json': {'sessions': sessions}}),
+        ('/batch-analyze?stream=1', {'json': {'sessions': sessions}}),
+        ('/stream/check', {'json': {'samples': voltages, 'sampleRate': sample_rate}})
+    ]
+
+    cases = []
+    for endpoint, kwargs in requests:
+        try:
+            response = client.post(endpoint.split(' ')[0], **kwargs)
+            body = response.get_data()
+        except Exception as e:
+            # Streamed bodies are serialized after the status line is sent
+            cases.append((endpoint, [f"{type(e).__name__}: {str(e)}"]))
+            continue
+        problems = [] if response.status_code == 200 else [f"HTTP {response.status_code}: {body[:200].decode()}"]
+        if response.status_code == 200 and response.mimetype == 'application/x-ndjson':
+            problems += [line['error'] for line in map(json.loads, body.splitlines()) if 'error' in line]
+        cases.append((endpoint, problems))
+
+    # Job results go through the same serializer once the worker has finished
+    job = client.post('/jobs', json={'sessions': sessions}).get_json()
+    problems = []
+    for _ in range(100):
+        response = client.get(job['statusUrl'])
+        if response.status_code != 200 or response.get_json()['status'] not in ('queued', 'running'):
+            break
+        time.sleep(0.1)
+    if response.status_code != 200:
+        problems.append(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    elif response.get_json()['status'] != 'completed':
+        problems.append(f"job {response.get_json()['status']}: {response.get_json()['error']}")
+    cases.append(('/jobs/<id>', problems))
+    service.jobs.close()
+    return cases
+
+def main():
+    parser = argparse.ArgumentParser(description='Check float32 analysis against float64')
+    parser.add_argument('--durations', type=float, nargs='+', default=[10, 60, 600], help='signal lengths in seconds')
+    parser.add_argument('--sample-rates', type=int, nargs='+', default=[125, 250, 500], help='sample rates in Hz')
+    parser.add_argument('--irregularities', type=float, nargs='+', default=[0.0, 0.1, 0.3], help='R-R irregularity levels')
+    parser.add_argument('--batch-size', type=int, default=200, help='sessions in the batch case')
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    reference = ECGAnalyzer(precision='float64')
+    candidate = ECGAnalyzer(precision='float32')
+
+    cases = []
+    for duration in args.durations:
+        for sample_rate in args.sample_rates:
+            for irregularity in args.irregularities:
+                ecg_signal, _ = generate_ecg(duration, sample_rate, irregularity=irregularity, seed=int(duration) + sample_rate)
+
+                ref_peaks, _ = peak_positions(reference, ecg_signal, sample_rate)
+                cand_peaks, cand_dtype = peak_positions(candidate, ecg_signal, sample_rate)
+                problems = compare_peaks(ref_peaks, cand_peaks)
+                if cand_dtype != np.float32:
+                    problems.append(f"float32 pipeline produced {cand_dtype}")
+                problems += compare_results(reference.analyze(ecg_signal, sample_rate), candidate.analyze(ecg_signal, sample_rate))
+
+                cases.append({'mode': 'single', 'duration_s': duration, 'sample_rate': sample_rate,
+                              'irregularity': irregularity, 'problems': problems})
+
+    # Long-recording and multi-lead paths
+    ecg_signal, _ = generate_ecg(1800, 250, irregularity=0.1, seed=7)
+    problems = compare_results(
+        reference.analyze_long(ecg_signal, 250, window_seconds=120),
+        candidate.analyze_long(ecg_signal, 250, window_seconds=120)
+    )
+    cases.append({'mode': 'long', 'duration_s': 1800, 'sample_rate': 250, 'problems': problems})
+
+    leads = np.stack([generate_ecg(30, 500, seed=seed)[0] for seed in range(12)])
+    problems = compare_results(reference.analyze_multilead(leads, 500), candidate.analyze_multilead(leads, 500))
+    cases.append({'mode': 'multilead', 'duration_s': 30, 'sample_rate': 500, 'problems': problems})
+
+    # Batch agreement and memory
+    signals = generate_batch(args.batch_size, 30, 250, seed=11)
+    ref_batch = reference.analyze_batch(signals, [250] * len(signals))
+    cand_batch = candidate.analyze_batch(signals, [250] * len(signals))
+    problems = []
+    for index, (ref_result, cand_result) in enumerate(zip(ref_batch, cand_batch)):
+        problems += [f"session {index}: {problem}" for problem in compare_results(ref_result, cand_result)]
+    cases.append({'mode': 'batch', 'duration_s': 30, 'sample_rate': 250, 'sessions': len(signals), 'problems': problems})
+
+    # Inputs are converted before measuring, so only the analysis itself is counted
+    long_signal, _ = generate_ecg(3600, 250, seed=6)
+    memory = {'batch': {}, 'single_1h': {}}
+    for precision, analyzer in (('float64', reference), ('float32', candidate)):
+        batch = [np.asarray(ecg_signal, dtype=analyzer.dtype) for ecg_signal in signals]
+        single = np.asarray(long_signal, dtype=analyzer.dtype)
+        memory['batch'][precision] = peak_memory(lambda: analyzer.analyze_batch(batch, [250] * len(batch)))
+        memory['single_1h'][precision] = peak_memory(lambda: analyzer.analyze(single, 250))
+    for workload, peaks in memory.items():
+        problems = [] if peaks['float32'] < peaks['float64'] else [
+            f"float32 peak {peaks['float32'] / 1e6:.1f} MB is not below float64 {peaks['float64'] / 1e6:.1f} MB"
+        ]
+        cases.append({'mode': 'memory', 'workload': workload, 'duration_s': 30 if workload == 'batch' else 3600,
+                      'sample_rate': 250, 'problems': problems})
+
+    # Every endpoint must return JSON-serializable results in float32 mode
+    ecg_signal, _ = generate_ecg(30, 250, seed=5)
+    for endpoint, problems in endpoint_cases(ecg_signal, 250):
+        cases.append({'mode': 'endpoint', 'endpoint': endpoint, 'duration_s': 30, 'sample_rate': 250, 'problems': problems})
+
+    failed = [case for case in cases if case['problems']]
+    for case in cases:
+        status = 'FAIL' if case['problems'] else 'ok'
+        label = f"{case['mode']:<10} {case['duration_s']:>7g}s @ {case['sample_rate']:>4} Hz"
+        if 'endpoint' in case:
+            label += f" {case['endpoint']}"
+        if 'workload' in case:
+            label += f" {case['workload']}"
+        if 'irregularity' in case:
+            label += f" irregularity {case['irregularity']:g}"
+        print(f"{status:<5} {label}" + (f": {'; '.join(case['problems'][:3])}" if case['problems'] else ''))
+    print(f"Batch of {len(signals)} peak memory: float64 {memory['batch']['float64'] / 1e6:.1f} MB, "
+          f"float32 {memory['batch']['float32'] / 1e6:.1f} MB")
+    print(f"One-hour recording peak memory: float64 {memory['single_1h']['float64'] / 1e6:.1f} MB, "
+          f"float32 {memory['single_1h']['float32'] / 1e6:.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cases': cases, 'peak_memory_bytes': memory}, f, indent=2)
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
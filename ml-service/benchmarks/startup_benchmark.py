@@ -0,0 +1,97 @@
+"""
+Startup Benchmark
+Measures cold import time and resident memory of the ML service in fresh
+interpreters, and checks that heavy ML libraries are not imported at startup.
+
+Usage:
+    python benchmarks/startup_benchmark.py --runs 5 --max-seconds 1.0 --output startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['torch', 'transformers', 'sklearn', 'onnxruntime']
+
+# Runs in a fresh interpreter and prints one JSON line
+PROBE = '''
+import json, sys, time, resource
+start = time.perf_counter()
+process_start = time.process_time()
+import app
+elapsed = time.perf_counter() - start
+cpu = time.process_time() - process_start
+
+rss_kb = None
+try:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+except OSError:
+    pass
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    peak_kb //= 1024
+
+print(json.dumps({
+    'import_seconds': elapsed,
+    'import_cpu_seconds': cpu,
+    'rss_mb': (rss_kb if rss_kb is not None else peak_kb) / 1024,
+    'peak_rss_mb': peak_kb / 1024,
+    'heavy_modules': [name for name in %r if name in sys.modules]
+}))
+''' % (HEAVY_MODULES,)
+
+def run_probe():
+    """Import the service in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=SERVICE_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure ML service startup time and RSS')
+    parser.add_argument('--runs', type=int, default=5, help='number of fresh interpreters')
+    parser.add_argument('--max-seconds', type=float, default=None, help='fail if median import time exceeds this')
+    parser.add_argument('--max-rss-mb', type=float, default=None, help='fail if median RSS exceeds this')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    runs = [run_probe() for _ in range(args.runs)]
+    summary = {
+        'runs': runs,
+        'median_import_seconds': statistics.median(run['import_seconds'] for run in runs),
+        'median_rss_mb': statistics.median(run['rss_mb'] for run in runs),
+        'heavy_modules': sorted({name for run in runs for name in run['heavy_modules']}),
+        'python': sys.version.split()[0]
+    }
+
+    failures = []
+    if args.max_seconds is not None and summary['median_import_seconds'] > args.max_seconds:
+        failures.append(f"import time {summary['median_import_seconds']:.3f}s > {args.max_seconds}s")
+    if args.max_rss_mb is not None and summary['median_rss_mb'] > args.max_rss_mb:
+        failures.append(f"RSS {summary['median_rss_mb']:.1f} MB > {args.max_rss_mb} MB")
+    if summary['heavy_modules']:
+        failures.append(f"heavy modules imported at startup: {', '.join(summary['heavy_modules'])}")
+    summary['failures'] = failures
+
+    report = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Synthetic ECG
+Deterministic ECG-like signals for benchmarks: Gaussian P-QRS-T beat template
+placed at (optionally jittered) beat times, plus baseline wander and noise,
+on an ADC-like scale similar to what the ESP32 sends.
+"""
+
+import numpy as np
+from scipy import signal
+
+def beat_template(sample_rate):
+    """One P-QRS-T complex, centred on the R-peak"""
+    t = np.arange(-0.3, 0.45, 1 / sample_rate)
+    return (
+        120 * np.exp(-((t + 0.18) / 0.025) ** 2)    # P wave
+        - 100 * np.exp(-((t + 0.03) / 0.008) ** 2)  # Q
+        + 1000 * np.exp(-(t / 0.012) ** 2)          # R
+        - 150 * np.exp(-((t - 0.03) / 0.008) ** 2)  # S
+        + 200 * np.exp(-((t - 0.25) / 0.05) ** 2)   # T wave
+    ), int(round(0.3 * sample_rate))
+
+def generate_ecg(duration_s, sample_rate=250, heart_rate=72, irregularity=0.0,
+                 noise=10.0, seed=0, dtype=np.float64):
+    """
+    Generate a synthetic ECG
+    Returns (signal, r_peak_indices)
+    irregularity: relative standard deviation of R-R intervals (0.2+ looks like AFib)
+    """
+    rng = np.random.default_rng(seed)
+    n_samples = int(duration_s * sample_rate)
+
+    # Beat times from jittered R-R intervals
+    mean_rr = 60 / heart_rate
+    n_beats = int(duration_s / mean_rr * 1.5) + 2
+    rr = mean_rr * np.clip(1 + irregularity * rng.standard_normal(n_beats), 0.4, 2.5)
+    beat_times = 0.5 + np.concatenate(([0], np.cumsum(rr)))
+    r_peaks = np.round(beat_times * sample_rate).astype(np.int64)
+    r_peaks = r_peaks[r_peaks < n_samples - int(0.5 * sample_rate)]
+
+    # Impulse train convolved with the beat template
+    impulses = np.zeros(n_samples)
+    impulses[r_peaks] = 1.0
+    template, centre = beat_template(sample_rate)
+    ecg = signal.oaconvolve(impulses, template)[centre:centre + n_samples]
+
+    # Baseline wander, noise and ADC offset
+    t = np.arange(n_samples) / sample_rate
+    ecg += 40 * np.sin(2 * np.pi * 0.3 * t) + noise * rng.standard_normal(n_samples) + 2048
+
+    return ecg.astype(dtype, copy=False), r_peaks
+
+def generate_batch(batch_size, duration_s, sample_rate=250, seed=0):
+    """Batch of synthetic sessions with varied heart rate and rhythm"""
+    rng = np.random.default_rng(seed)
+    return [
+        generate_ecg(
+            duration_s,
+            sample_rate,
+            heart_rate=float(rng.uniform(45, 140)),
+            irregularity=float(rng.choice([0.0, 0.05, 0.25])),
+            seed=seed + i
+        )[0]
+        for i in range(batch_size)
+    ]
@@ -0,0 +1,182 @@
+"""
+Request and Response Compression
+WSGI middleware that accepts Content-Encoding: gzip or zstd request bodies.
+The body is decompressed as it is read, so the streaming JSON parser consumes
+plain bytes without the compressed or decompressed body ever being held in
+full. Decompressed size and compression ratio are capped, and exceeding
+either stops the read with a 413 (decompression-bomb protection).
+
+Responses can optionally be compressed for clients that send Accept-Encoding.
+
+Configuration (environment variables):
+- REQUEST_MAX_DECOMPRESSED_BYTES: largest decompressed body accepted (default 256 MB)
+- REQUEST_MAX_COMPRESSION_RATIO: largest decompressed/compressed ratio once past 1 MB (default 200)
+- RESPONSE_COMPRESSION: compress responses when the client accepts it (default false)
+- RESPONSE_COMPRESSION_MIN_BYTES: smaller responses are sent as-is (default 1024)
+
+zstd needs the optional zstandard package; without it zstd bodies get a 415.
+"""
+
+import io
+import os
+import gzip
+import json
+import zlib
+
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import get_input_stream
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# environ key set on requests whose body was decompressed, holding the encoding
+CONTENT_ENCODING_KEY = 'heartwise.content_encoding'
+
+# The ratio limit only applies past this much output, so small bodies of repeated values pass
+RATIO_CHECK_MIN_BYTES = 1024 * 1024
+
+# Bytes pulled from the decompressor per read when the whole body is requested
+READ_CHUNK_SIZE = 1 << 20
+
+GZIP_ENCODINGS = ('gzip', 'x-gzip')
+ZSTD_ENCODINGS = ('zstd',)
+
+# Response levels favour speed: the link to the backend is fast, CPU is shared with analysis
+GZIP_LEVEL = 1
+ZSTD_LEVEL = 3
+
+class DecompressionError(BadRequest):
+    """Compressed body is corrupt or truncated (400)"""
+
+class DecompressionLimitError(RequestEntityTooLarge):
+    """Decompressed body exceeds the size or ratio limit (413)"""
+
+class _CountingStream:
+    """Read-only wrapper counting the compressed bytes consumed"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+class DecompressingStream(io.RawIOBase):
+    """File-like view of a decompressed request body that enforces the bomb limits"""
+
+    def __init__(self, source, encoding, max_bytes, max_ratio):
+        self._source = _CountingStream(source)
+        self.encoding = encoding
+        self.max_bytes = max_bytes
+        self.max_ratio = max_ratio
+        self.bytes_out = 0
+
+        if encoding in ZSTD_ENCODINGS:
+            self._stream = zstandard.ZstdDecompressor().stream_reader(self._source, read_across_frames=True)
+            self._errors = (zstandard.ZstdError,)
+        else:
+            self._stream = gzip.GzipFile(fileobj=self._source, mode='rb')
+            self._errors = (OSError, EOFError, zlib.error)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        try:
+            data = self._stream.read(len(buffer))
+        except self._errors as e:
+            raise DecompressionError(f'Invalid {self.encoding} request body: {str(e)}')
+
+        size = len(data)
+        buffer[:size] = data
+        self.bytes_out += size
+        self._check_limits()
+        return size
+
+    def readall(self):
+        chunks = []
+        while True:
+            chunk = self.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def _check_limits(self):
+        if self.bytes_out > self.max_bytes:
+            raise DecompressionLimitError(f'Decompressed request body exceeds {self.max_bytes} bytes')
+        if (self.bytes_out > RATIO_CHECK_MIN_BYTES
+                and self.bytes_out > self.max_ratio * max(self._source.bytes_read, 1)):
+            raise DecompressionLimitError(f'Request body compression ratio exceeds {self.max_ratio:g}')
+
+class RequestDecompressionMiddleware:
+    """
+    Wrap a WSGI app so gzip/zstd request bodies reach it decompressed
+    The Content-Encoding and Content-Length headers are removed and the stream is
+    marked terminated, so Flask reads it to the end like a chunked body.
+    """
+
+    def __init__(self, app, max_bytes=None, max_ratio=None):
+        self.app = app
+        self.max_bytes = max_bytes or int(os.environ.get('REQUEST_MAX_DECOMPRESSED_BYTES', 256 * 1024 * 1024))
+        self.max_ratio = max_ratio or float(os.environ.get('REQUEST_MAX_COMPRESSION_RATIO', 200))
+
+    def supported_encodings(self):
+        return GZIP_ENCODINGS + (ZSTD_ENCODINGS if zstandard is not None else ())
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not encoding or encoding == 'identity':
+            return self.app(environ, start_response)
+
+        if encoding not in self.supported_encodings():
+            response = Response(
+                json.dumps({'error': f'Unsupported Content-Encoding: {encoding}'}),
+                status=415,
+                mimetype='application/json',
+                headers={'Accept-Encoding': ', '.join(self.supported_encodings())}
+            )
+            return response(environ, start_response)
+
+        environ['wsgi.input'] = DecompressingStream(get_input_stream(environ), encoding, self.max_bytes, self.max_ratio)
+        environ['wsgi.input_terminated'] = True
+        environ.pop('CONTENT_LENGTH', None)
+        environ.pop('HTTP_CONTENT_ENCODING', None)
+        environ[CONTENT_ENCODING_KEY] = encoding
+        return self.app(environ, start_response)
+
+class ResponseCompressor:
+    """Compress finished (non-streamed) responses with zstd or gzip per Accept-Encoding"""
+
+    def __init__(self, enabled=None, min_bytes=None):
+        if enabled is None:
+            enabled = os.environ.get('RESPONSE_COMPRESSION', 'false').lower() in ('1', 'true', 'yes')
+        self.enabled = enabled
+        self.min_bytes = min_bytes if min_bytes is not None else int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+        self.encodings = (['zstd'] if zstandard is not None else []) + ['gzip']
+
+    def compress(self, response, accept_encodings):
+        """Compress response in place when allowed; streamed responses are left alone"""
+        if (not self.enabled or response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = accept_encodings.best_match(self.encodings)
+        body = response.get_data()
+        if encoding is None or len(body) < self.min_bytes:
+            return response
+
+        if encoding == 'zstd':
+            body = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+        else:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,148 @@
+"""
+Feature Extraction
+Fixed, versioned feature vector for the arrhythmia classifier, computed for a
+whole batch of sessions in one vectorized pass over their concatenated R-R
+series. Training and inference both build their inputs here.
+"""
+
+import numpy as np
+
+# Bump whenever a feature is added, removed, reordered or redefined;
+# models record the version they were trained with
+FEATURE_VERSION = 2
+
+FEATURE_NAMES = [
+    # R-R statistics
+    'heart_rate',
+    'rr_count',
+    'rr_mean',
+    'rr_std',
+    'rr_min',
+    'rr_max',
+    'rr_cv',
+    # HRV
+    'sdnn',
+    'rmssd',
+    'pnn50',
+    'pnn20',
+    # Successive differences and outliers (AFib / PVC rules)
+    'large_diff_count',
+    'large_diff_fraction',
+    'rr_outlier_count',
+    'rr_outlier_fraction',
+    # Signal quality
+    'signal_std',
+    'signal_range',
+    'signal_quality_score',
+    # Beat morphology (filtered R-peak amplitudes)
+    'r_amplitude_mean',
+    'r_amplitude_std',
+    'r_amplitude_cv'
+]
+
+N_FEATURES = len(FEATURE_NAMES)
+
+def session_inputs(rr_intervals, signal_quality, r_amplitudes=None):
+    """Per-session raw inputs consumed by extract_feature_matrix"""
+    return {
+        'rr_intervals': np.asarray(rr_intervals, dtype=float),
+        'r_amplitudes': np.asarray(r_amplitudes if r_amplitudes is not None else [], dtype=float),
+        'signal_std': float(signal_quality['std_deviation']),
+        'signal_range': float(signal_quality['signal_range']),
+        'quality_score': float(signal_quality['score'])
+    }
+
+def _segment_stats(values, lengths):
+    """
+    Per-segment sum, mean, std, min and max of a concatenated ragged array
+    Empty segments get zeros
+    """
+    n = len(lengths)
+    segment_ids = np.repeat(np.arange(n), lengths)
+    counts = lengths.astype(float)
+    safe_counts = np.maximum(counts, 1)
+
+    sums = np.bincount(segment_ids, weights=values, minlength=n)
+    means = sums / safe_counts
+    centred = values - means[segment_ids]
+    stds = np.sqrt(np.bincount(segment_ids, weights=centred ** 2, minlength=n) / safe_counts)
+
+    minimums = np.zeros(n)
+    maximums = np.zeros(n)
+    non_empty = lengths > 0
+    if np.any(non_empty):
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[non_empty]
+        minimums[non_empty] = np.minimum.reduceat(values, starts)
+        maximums[non_empty] = np.maximum.reduceat(values, starts)
+
+    return segment_ids, means, stds, minimums, maximums
+
+def extract_feature_matrix(sessions):
+    """
+    (n_sessions, N_FEATURES) float32 matrix from session_inputs() dicts
+    Columns follow FEATURE_NAMES
+    """
+    n = len(sessions)
+    if n == 0:
+        return np.zeros((0, N_FEATURES), dtype=np.float32)
+
+    rr_lengths = np.array([session['rr_intervals'].size for session in sessions])
+    rr = np.concatenate([session['rr_intervals'] for session in sessions]) if rr_lengths.sum() else np.zeros(0)
+    rr_ids, rr_mean, rr_std, rr_min, rr_max = _segment_stats(rr, rr_lengths)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        heart_rate = np.where(rr_mean > 0, 60 / rr_mean, 0)
+        rr_cv = np.where(rr_mean > 0, rr_std / rr_mean * 100, 0)
+
+    # Successive differences within each session (pairs straddling two sessions dropped)
+    diffs = np.diff(rr)
+    same_session = rr_ids[1:] == rr_ids[:-1] if rr.size > 1 else np.zeros(0, dtype=bool)
+    diff_ids = rr_ids[1:][same_session] if rr.size > 1 else np.zeros(0, dtype=int)
+    diffs_ms = np.abs(diffs[same_session]) * 1000 if rr.size > 1 else np.zeros(0)
+    n_diffs = np.bincount(diff_ids, minlength=n).astype(float)
+    safe_diffs = np.maximum(n_diffs, 1)
+
+    rmssd = np.sqrt(np.bincount(diff_ids, weights=diffs_ms ** 2, minlength=n) / safe_diffs)
+    pnn50 = np.bincount(diff_ids, weights=diffs_ms > 50, minlength=n) / safe_diffs * 100
+    pnn20 = np.bincount(diff_ids, weights=diffs_ms > 20, minlength=n) / safe_diffs * 100
+    large_diff_count = np.bincount(diff_ids, weights=diffs_ms > 120, minlength=n)
+    large_diff_fraction = large_diff_count / np.maximum(rr_lengths, 1)
+
+    # R-R outliers beyond two standard deviations (PVC heuristic)
+    outliers = np.abs(rr - rr_mean[rr_ids]) > 2 * rr_std[rr_ids] if rr.size else np.zeros(0, dtype=bool)
+    rr_outlier_count = np.bincount(rr_ids, weights=outliers, minlength=n)
+    rr_outlier_fraction = rr_outlier_count / np.maximum(rr_lengths, 1)
+
+    amplitude_lengths = np.array([session['r_amplitudes'].size for session in sessions])
+    amplitudes = np.concatenate([session['r_amplitudes'] for session in sessions]) if amplitude_lengths.sum() else np.zeros(0)
+    _, amplitude_mean, amplitude_std, _, _ = _segment_stats(amplitudes, amplitude_lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amplitude_cv = np.where(amplitude_mean != 0, amplitude_std / np.abs(amplitude_mean) * 100, 0)
+
+    # HRV is only defined from two intervals on (calculate_hrv convention)
+    has_hrv = rr_lengths >= 2
+    columns = [
+        heart_rate,
+        rr_lengths,
+        rr_mean,
+        rr_std,
+        rr_min,
+        rr_max,
+        rr_cv,
+        np.where(has_hrv, rr_std * 1000, 0),
+        np.where(has_hrv, rmssd, 0),
+        np.where(has_hrv, pnn50, 0),
+        np.where(has_hrv, pnn20, 0),
+        large_diff_count,
+        large_diff_fraction,
+        rr_outlier_count,
+        rr_outlier_fraction,
+        [session['signal_std'] for session in sessions],
+        [session['signal_range'] for session in sessions],
+        [session['quality_score'] for session in sessions],
+        amplitude_mean,
+        amplitude_std,
+        amplitude_cv
+    ]
+
+    return np.column_stack(columns).astype(np.float32)
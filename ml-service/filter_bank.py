@@ -0,0 +1,106 @@
+"""
+Filter Bank
+Butterworth band-pass filters in second-order-section form, designed once per
+(sample_rate, band, order) and shared by every analyzer and stream in the
+process. Each entry carries its steady-state initial conditions, so neither
+zero-phase nor streaming filtering runs a design step on the hot path.
+"""
+
+import threading
+
+import numpy as np
+from scipy import signal
+
+# Pan-Tompkins QRS band in Hz
+QRS_BAND = (5, 15)
+
+# (sample_rate, band, order) -> SOSFilter
+_filters = {}
+_filters_lock = threading.Lock()
+
+def get_filter(sample_rate, band=QRS_BAND, order=2):
+    """Cached band-pass filter for this sample rate"""
+    key = (float(sample_rate), tuple(band), order)
+    sos_filter = _filters.get(key)
+    if sos_filter is None:
+        with _filters_lock:
+            sos_filter = _filters.get(key)
+            if sos_filter is None:
+                sos_filter = SOSFilter(sample_rate, band, order)
+                _filters[key] = sos_filter
+    return sos_filter
+
+class SOSFilter:
+    """
+    Designed band-pass filter
+    sos: (n_sections, 6) coefficients; zi: (n_sections, 2) step-response state
+    """
+
+    def __init__(self, sample_rate, band, order):
+        nyquist = sample_rate / 2
+        self.sample_rate = sample_rate
+        self.sos = signal.butter(order, [band[0] / nyquist, band[1] / nyquist], btype='band', output='sos')
+        self.zi = signal.sosfilt_zi(self.sos)
+
+        # Odd-extension length used by sosfiltfilt
+        trailing_zeros = min(int(np.sum(self.sos[:, 2] == 0)), int(np.sum(self.sos[:, 5] == 0)))
+        self.padlen = 3 * (2 * len(self.sos) + 1 - trailing_zeros)
+
+        # Shared between threads; callers only ever get scaled copies
+        self.zi.setflags(write=False)
+
+        # Coefficients per working dtype, so float32 input is never promoted to float64
+        self._coefficients = {np.dtype(np.float64): (self.sos, self.zi)}
+
+    def coefficients(self, dtype):
+        """(sos, zi) in the given floating dtype"""
+        dtype = np.dtype(dtype)
+        coefficients = self._coefficients.get(dtype)
+        if coefficients is None:
+            coefficients = (self.sos.astype(dtype), self.zi.astype(dtype))
+            self._coefficients[dtype] = coefficients
+        return coefficients
+
+    def _state(self, zi, first, ndim):
+        """Initial conditions scaled to the first sample(s), shaped for axis=-1"""
+        zi = zi.reshape((len(self.sos),) + (1,) * (ndim - 1) + (2,))
+        return zi * first
+
+    def filtfilt(self, x):
+        """
+        Zero-phase filtering along the last axis
+        Same result as signal.sosfiltfilt(sos, x, axis=-1), without redoing sosfilt_zi
+        float32 input is filtered in float32, anything else in float64
+        """
+        x = np.asarray(x)
+        if x.dtype != np.float32:
+            x = x.astype(np.float64, copy=False)
+        sos, zi = self.coefficients(x.dtype)
+        edge = self.padlen
+        if x.shape[-1] <= edge:
+            raise ValueError(f"The length of the input vector x must be greater than padlen, which is {edge}.")
+
+        # Odd extension at both ends
+        left = 2 * x[..., :1] - x[..., edge:0:-1]
+        right = 2 * x[..., -1:] - x[..., -2:-edge - 2:-1]
+        extended = np.concatenate((left, x, right), axis=-1)
+
+        forward, _ = signal.sosfilt(sos, extended, axis=-1, zi=self._state(zi, extended[..., :1], x.ndim))
+        backward = forward[..., ::-1]
+        filtered, _ = signal.sosfilt(sos, backward, axis=-1, zi=self._state(zi, backward[..., :1], x.ndim))
+
+        return filtered[..., ::-1][..., edge:-edge]
+
+    def initial_state(self, first_sample):
+        """Causal filter state for a stream starting at first_sample"""
+        return self.zi * first_sample
+
+    def sosfilt(self, x, state):
+        """Causal filtering of a 1-D chunk; returns (filtered, new_state)"""
+        return signal.sosfilt(self.sos, x, zi=state)
+
+    def group_delay(self, frequency):
+        """Group delay in samples at frequency (Hz)"""
+        b, a = signal.sos2tf(self.sos)
+        _, delay = signal.group_delay((b, a), w=[frequency], fs=self.sample_rate)
+        return float(delay[0])
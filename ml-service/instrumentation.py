@@ -0,0 +1,118 @@
+"""
+Instrumentation
+Per-stage wall and CPU timing for the analysis hot path. Every timed stage is
+aggregated into in-process histograms; per-request breakdowns are only kept
+when a request opts in.
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is +Inf
+HISTOGRAM_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+class Histogram:
+    """Fixed-bucket histogram with count and sum"""
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+        return {
+            'buckets': list(self.buckets),
+            'counts': counts,
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else 0
+        }
+
+class StageHistograms:
+    """Wall and CPU time histograms (ms) per stage name"""
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def _get(self, stage):
+        histograms = self._stages.get(stage)
+        if histograms is None:
+            with self._lock:
+                histograms = self._stages.setdefault(stage, (Histogram(), Histogram()))
+        return histograms
+
+    def observe(self, stage, wall_ms, cpu_ms):
+        wall, cpu = self._get(stage)
+        wall.observe(wall_ms)
+        cpu.observe(cpu_ms)
+
+    def snapshot(self):
+        return {
+            stage: {'wall_ms': wall.snapshot(), 'cpu_ms': cpu.snapshot()}
+            for stage, (wall, cpu) in list(self._stages.items())
+        }
+
+# Process-wide stage histograms
+stage_histograms = StageHistograms()
+
+class StageTimer:
+    """
+    Times named stages of one request
+    Always feeds stage_histograms; keeps a per-request breakdown only when enabled
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - wall_start) * 1000, (time.thread_time() - cpu_start) * 1000)
+
+    def record(self, name, wall_ms, cpu_ms):
+        """Record an externally measured stage"""
+        stage_histograms.observe(name, wall_ms, cpu_ms)
+        if self.enabled:
+            # Stages repeated within one request (e.g. per batch group) add up
+            entry = self.stages.get(name)
+            if entry is None:
+                self.stages[name] = [wall_ms, cpu_ms, 1]
+            else:
+                entry[0] += wall_ms
+                entry[1] += cpu_ms
+                entry[2] += 1
+
+    def to_dict(self):
+        """Timings block for the response"""
+        return {
+            'total_ms': round((time.perf_counter() - self._start) * 1000, 3),
+            'stages': {
+                name: {'wall_ms': round(wall, 3), 'cpu_ms': round(cpu, 3), 'calls': calls}
+                for name, (wall, cpu, calls) in self.stages.items()
+            }
+        }
+
+    def summary(self):
+        """One-line breakdown for logs"""
+        return ', '.join(f"{name}={wall:.2f}ms" for name, (wall, _, _) in self.stages.items())
@@ -0,0 +1,229 @@
+"""
+Analysis Jobs
+Background execution of large batch analyses. Submitting a job only stores
+its sessions and returns an id; worker threads run the sessions through the
+batch backend chunk by chunk, so progress and the results finished so far can
+be polled while the rest is still running. Jobs can be cancelled, and finished
+jobs are dropped after a TTL.
+
+Configuration (environment variables):
+- JOB_WORKERS: worker threads running jobs (default 2)
+- JOB_MAX_QUEUED: jobs waiting to start before new ones are rejected (default 16)
+- JOB_MAX_SESSIONS: sessions accepted per job (default 5000)
+- JOB_CHUNK_SIZE: sessions analyzed between progress updates (default 32)
+- JOB_RESULT_TTL_SECONDS: how long finished jobs and their results are kept (default 3600)
+"""
+
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+
+from micro_batcher import QueueFullError
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+class Job:
+    """One submitted batch and its progress"""
+
+    def __init__(self, signals, sample_rates, session_ids):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.total = len(signals)
+        self.completed = 0
+        self.results = [None] * self.total
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self.signals = signals
+        self.sample_rates = sample_rates
+        self.session_ids = session_ids
+        self.cancel_requested = threading.Event()
+
+    def finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+
+        # Inputs are no longer needed; only results are kept until expiry
+        self.signals = None
+        self.sample_rates = None
+
+    def to_dict(self, ttl, include_results=True, offset=0):
+        """Status snapshot; results[offset:completed] are included when asked for"""
+        completed = self.completed
+        snapshot = {
+            'jobId': self.id,
+            'status': self.status,
+            'total': self.total,
+            'completed': completed,
+            'progress': round(completed / self.total, 3) if self.total else 1.0,
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+            'expiresAt': self.finished_at + ttl if self.finished_at is not None else None,
+            'error': self.error
+        }
+        if include_results:
+            offset = min(max(offset, 0), completed)
+            snapshot['offset'] = offset
+            snapshot['results'] = self.results[offset:completed]
+        return snapshot
+
+class JobManager:
+    """
+    Bounded job queue served by background worker threads
+    analyze_batch(signals, sample_rates) -> results is called once per chunk
+    """
+
+    def __init__(self, analyze_batch, workers=None, max_queued=None, max_sessions=None,
+                 chunk_size=None, result_ttl=None):
+        self.analyze_batch = analyze_batch
+        self.workers = workers or int(os.environ.get('JOB_WORKERS', 2))
+        self.max_sessions = max_sessions or int(os.environ.get('JOB_MAX_SESSIONS', 5000))
+        self.chunk_size = chunk_size or int(os.environ.get('JOB_CHUNK_SIZE', 32))
+        self.result_ttl = result_ttl if result_ttl is not None else float(os.environ.get('JOB_RESULT_TTL_SECONDS', 3600))
+
+        self._queue = queue.Queue(maxsize=max_queued or int(os.environ.get('JOB_MAX_QUEUED', 16)))
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_started(self):
+        """Start worker threads on first use"""
+        if self._threads:
+            return
+        with self._lock:
+            if not self._threads:
+                for index in range(self.workers):
+                    thread = threading.Thread(target=self._run, name=f'job-worker-{index}', daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def submit(self, signals, sample_rates, session_ids):
+        """Queue a job; raises ValueError for oversized jobs and QueueFullError when full"""
+        if not signals:
+            raise ValueError('Job has no sessions')
+        if len(signals) > self.max_sessions:
+            raise ValueError(f'Job has {len(signals)} sessions, the limit is {self.max_sessions}')
+
+        self._ensure_started()
+        self._expire()
+
+        job = Job(signals, sample_rates, session_ids)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise QueueFullError('Job queue is full, retry later')
+
+        logger.info(f"Queued job {job.id} with {job.total} sessions")
+        return job
+
+    def get(self, job_id):
+        """Job by id, or None if unknown or expired"""
+        self._expire()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def all_jobs(self):
+        self._expire()
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """
+        Cancel a job; queued jobs stop immediately, running ones after the current chunk
+        Returns the job, or None if unknown
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        job.cancel_requested.set()
+        with self._lock:
+            if job.status == QUEUED:
+                job.finish(CANCELLED)
+        return job
+
+    def counts(self):
+        """Jobs per status"""
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in (QUEUED, RUNNING) + FINISHED}
+
+    def queued(self):
+        return self.counts()[QUEUED]
+
+    def running(self):
+        return self.counts()[RUNNING]
+
+    def _expire(self):
+        """Drop finished jobs older than the result TTL"""
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            with self._lock:
+                if job.status != QUEUED:
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            try:
+                self._process(job)
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+                with self._lock:
+                    job.finish(FAILED, str(e))
+
+    def _process(self, job):
+        for start in range(0, job.total, self.chunk_size):
+            if job.cancel_requested.is_set():
+                with self._lock:
+                    job.finish(CANCELLED)
+                logger.info(f"Cancelled job {job.id} after {job.completed}/{job.total} sessions")
+                return
+
+            end = min(start + self.chunk_size, job.total)
+            results = self.analyze_batch(job.signals[start:end], job.sample_rates[start:end])
+            for offset, result in enumerate(results):
+                result['sessionId'] = job.session_ids[start + offset]
+                job.results[start + offset] = result
+            job.completed = end
+
+        with self._lock:
+            job.finish(COMPLETED)
+        logger.info(f"Finished job {job.id}: {job.total} sessions in {job.finished_at - job.started_at:.1f}s")
+
+    def close(self):
+        """Stop worker threads; queued jobs are left unfinished"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
@@ -0,0 +1,191 @@
+"""
+Streaming JSON Ingest
+Incremental parser for large /analyze bodies. The request body is read in
+chunks and the voltage_mv values inside the "ecgData" array are matched at
+the byte level and written straight into a growable NumPy buffer, so no
+per-sample dicts are built. Everything outside ecgData (sessionId,
+sampleRate, ...) is small and parsed with the json module at the end.
+
+ecgData points must be flat objects (no nested objects or arrays), each with
+a voltage_mv that is a number or a numeric string. The backend sends strings,
+since node-postgres returns DECIMAL columns as text. Only the top-level
+ecgData key is read; an ecgData inside a nested object is left to the json module.
+
+Columnar bodies ({"voltages": [...]} or a base64 sample blob) carry no per-sample
+keys at all and are decoded by decode_columnar.
+"""
+
+import re
+import json
+import base64
+
+import numpy as np
+
+ECG_DATA_START = re.compile(rb'"ecgData"\s*:\s*\[')
+
+# A number, optionally quoted
+VOLTAGE_VALUE = re.compile(rb'"voltage_mv"\s*:\s*"?([-+0-9.eE]+)"?')
+
+# Complete JSON strings, dropped before counting brackets
+JSON_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"')
+
+# Base64 sample formats of columnar bodies (little-endian)
+COLUMNAR_SAMPLE_FORMATS = {
+    'float32': np.dtype('<f4'),
+    'int16': np.dtype('<i2')
+}
+
+# Rough bytes per {"timestamp_ms": ..., "voltage_mv": ...} point, for the initial buffer size
+BYTES_PER_POINT = 40
+
+class SampleBuffer:
+    """Append-only NumPy buffer that doubles its capacity when full"""
+
+    def __init__(self, dtype=np.float64, capacity=1024):
+        self._data = np.empty(max(int(capacity), 16), dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        needed = self.size + len(values)
+        if needed > self._data.size:
+            grown = np.empty(max(needed, self._data.size * 2), dtype=self._data.dtype)
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+        self._data[self.size:needed] = values
+        self.size = needed
+
+    def array(self):
+        """The filled part (a copy only if more than a quarter of the buffer is unused)"""
+        if self.size < self._data.size * 3 // 4:
+            return self._data[:self.size].copy()
+        return self._data[:self.size]
+
+def _find_ecg_data(head, start):
+    """
+    First top-level "ecgData": [ in head at or after start
+    Returns (match or None, offset to resume searching from once more bytes arrive)
+    """
+    resume = max(len(head) - 16, start)
+    for match in ECG_DATA_START.finditer(head, start):
+        # Outside any string and directly inside the body object
+        prefix = JSON_STRING.sub(b'', bytes(head[:match.start()]))
+        depth = prefix.count(b'{') + prefix.count(b'[') - prefix.count(b'}') - prefix.count(b']')
+        if depth == 1 and b'"' not in prefix:
+            return match, resume
+        resume = max(resume, match.end())
+    return None, resume
+
+def _voltages(region, dtype):
+    """Voltages of the complete points in region, checking every point has one"""
+    matches = VOLTAGE_VALUE.findall(region)
+    if len(matches) != region.count(b'{'):
+        raise ValueError('Every ecgData point needs a numeric voltage_mv')
+    try:
+        return np.fromiter(map(float, matches), dtype=dtype, count=len(matches))
+    except ValueError:
+        raise ValueError('Invalid voltage_mv value in ecgData')
+
+def parse_ecg_stream(stream, dtype=np.float64, chunk_size=1 << 20, size_hint=None):
+    """
+    Parse {"ecgData": [{"voltage_mv": ...}, ...], ...} from a file-like stream
+    Returns (fields, voltages): fields holds every other top-level key; voltages is
+    None when the body has no ecgData. Raises ValueError on malformed input.
+    """
+    buffer = SampleBuffer(dtype, (size_hint or 0) // BYTES_PER_POINT)
+    head = bytearray()  # bytes up to and including the '[' opening ecgData
+    pending = b''       # ecgData bytes not yet converted (an incomplete point)
+    tail = None         # bytes from the closing ']' on, once seen
+    in_data = False
+    scanned = 0
+
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+
+        if tail is not None:
+            tail += chunk
+            continue
+
+        if not in_data:
+            # Still looking for the start of ecgData
+            head += chunk
+            match, scanned = _find_ecg_data(head, scanned)
+            if match is None:
+                continue
+            chunk = head[match.end():]
+            head = head[:match.end()]
+            in_data = True
+
+        data = pending + chunk
+        end = data.find(b']')
+        if end >= 0:
+            buffer.extend(_voltages(data[:end], dtype))
+            tail = bytearray(data[end:])
+            pending = b''
+        else:
+            # Convert complete points now, keep the partial one for the next chunk
+            last = data.rfind(b'}') + 1
+            buffer.extend(_voltages(data[:last], dtype))
+            pending = data[last:]
+
+    if not in_data:
+        return json.loads(head or b'null'), None
+    if tail is None:
+        raise ValueError('Unterminated ecgData array')
+
+    # Parse the rest with an empty ecgData in its place, which also validates the structure
+    fields = json.loads(head + tail)
+    if not isinstance(fields, dict):
+        raise ValueError('Request body must be a JSON object')
+    if fields.pop('ecgData', None) != []:
+        raise ValueError('Duplicate ecgData key')
+    return fields, buffer.array()
+
+def decode_columnar(fields, dtype=np.float64):
+    """
+    Voltages of a columnar body
+    {"voltages": [0.12, ...]} or {"voltages": "<base64>", "sampleFormat": "float32" | "int16",
+    "scale": mV per count}. Optional "timestamps" are per-sample deltas in ms from
+    startMs; they must match the voltages and give the sample rate when none is sent.
+    Returns (voltages, inferred_sample_rate or None). Raises ValueError on bad input.
+    """
+    values = fields.get('voltages')
+    if isinstance(values, str):
+        sample_format = fields.get('sampleFormat', 'float32')
+        sample_dtype = COLUMNAR_SAMPLE_FORMATS.get(sample_format)
+        if sample_dtype is None:
+            raise ValueError(f'Unsupported sample format: {sample_format}')
+        try:
+            raw = base64.b64decode(values, validate=True)
+        except (ValueError, TypeError):
+            raise ValueError('voltages is not valid base64')
+        if len(raw) % sample_dtype.itemsize != 0:
+            raise ValueError(f'Decoded voltages are not a multiple of {sample_dtype.itemsize} bytes')
+        voltages = np.frombuffer(raw, dtype=sample_dtype).astype(dtype, copy=False)
+    elif isinstance(values, list):
+        try:
+            voltages = np.array(values, dtype=dtype)
+        except (ValueError, TypeError):
+            raise ValueError('voltages must be a list of numbers')
+        if voltages.ndim != 1:
+            raise ValueError('voltages must be a flat list of numbers')
+    else:
+        raise ValueError('voltages must be a list of numbers or a base64 string')
+
+    scale = fields.get('scale')
+    if scale is not None and scale != 1:
+        voltages = voltages * np.asarray(scale, dtype=dtype)
+
+    sample_rate = None
+    timestamps = fields.get('timestamps')
+    if timestamps is not None:
+        deltas = np.asarray(timestamps, dtype=float)
+        if deltas.shape != voltages.shape:
+            raise ValueError(f'timestamps has {deltas.size} entries for {voltages.size} voltages')
+        steps = deltas[1:]
+        steps = steps[steps > 0]
+        if steps.size:
+            sample_rate = round(1000 / float(np.median(steps)), 3)
+
+    return voltages, sample_rate
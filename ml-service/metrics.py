@@ -0,0 +1,183 @@
+"""
+Service Metrics
+Request, throughput and resource metrics rendered in the Prometheus text
+exposition format. Recording only touches short per-metric locks, so
+concurrent requests never wait on each other for long.
+"""
+
+import os
+import time
+import resource
+import threading
+
+from instrumentation import Histogram, stage_histograms
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Prometheus-style buckets in seconds
+LATENCY_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+class LabelledMetric:
+    """Family of metrics keyed by label values, created on first use"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def items(self):
+        return list(self._children.items())
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def process_rss_bytes():
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+class ServiceMetrics:
+    """All metrics exported by the ML service"""
+
+    def __init__(self, prefix='heartwise'):
+        self.prefix = prefix
+        self.started_at = time.time()
+
+        self.requests = LabelledMetric(Counter)                 # (route, method, status)
+        self.request_latency = LabelledMetric(lambda: Histogram(LATENCY_BUCKETS_S))  # (route, method)
+        self.in_flight = Gauge()
+        self.samples_processed = Counter()
+        self.sessions_analyzed = Counter()
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.microbatch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+
+        # name -> (help, callable) sampled at scrape time, e.g. queue depths
+        self._gauges = {}
+
+    def register_gauge(self, name, help_text, callback):
+        """Gauge whose value is read from callback() on every scrape"""
+        self._gauges[name] = (help_text, callback)
+
+    def observe_request(self, route, method, status, seconds):
+        self.requests.labels(route, method, str(status)).inc()
+        self.request_latency.labels(route, method).observe(seconds)
+
+    def observe_samples(self, samples, sessions=1):
+        self.samples_processed.inc(samples)
+        self.sessions_analyzed.inc(sessions)
+
+    def render(self, cache_stats=None):
+        """Text exposition format"""
+        p = self.prefix
+        lines = []
+
+        def header(name, help_text, metric_type):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+
+        def histogram(name, names, values, snapshot, scale=1.0):
+            cumulative = 0
+            for bound, count in zip(snapshot['buckets'], snapshot['counts']):
+                cumulative += count
+                le = 'le="%s"' % _format(bound * scale)
+                lines.append(f'{name}_bucket{_labels(names, values, le)} {cumulative}')
+            le = 'le="+Inf"'
+            lines.append(f'{name}_bucket{_labels(names, values, le)} {snapshot["count"]}')
+            lines.append(f'{name}_sum{_labels(names, values)} {_format(snapshot["sum"] * scale)}')
+            lines.append(f'{name}_count{_labels(names, values)} {snapshot["count"]}')
+
+        header(f'{p}_http_requests_total', 'HTTP requests by route, method and status', 'counter')
+        for (route, method, status), counter in self.requests.items():
+            lines.append(f'{p}_http_requests_total{_labels(("route", "method", "status"), (route, method, status))} {counter.value}')
+
+        header(f'{p}_http_request_duration_seconds', 'HTTP request latency', 'histogram')
+        for (route, method), latency in self.request_latency.items():
+            histogram(f'{p}_http_request_duration_seconds', ('route', 'method'), (route, method), latency.snapshot())
+
+        header(f'{p}_http_requests_in_flight', 'Requests currently being served', 'gauge')
+        lines.append(f'{p}_http_requests_in_flight {self.in_flight.value}')
+
+        header(f'{p}_samples_processed_total', 'ECG samples analyzed (rate() gives samples per second)', 'counter')
+        lines.append(f'{p}_samples_processed_total {self.samples_processed.value}')
+
+        header(f'{p}_sessions_analyzed_total', 'ECG sessions analyzed', 'counter')
+        lines.append(f'{p}_sessions_analyzed_total {self.sessions_analyzed.value}')
+
+        header(f'{p}_batch_size', 'Sessions per batch analysis request', 'histogram')
+        histogram(f'{p}_batch_size', (), (), self.batch_sizes.snapshot())
+
+        header(f'{p}_microbatch_size', 'Requests combined per micro-batch', 'histogram')
+        histogram(f'{p}_microbatch_size', (), (), self.microbatch_sizes.snapshot())
+
+        # Stage histograms are recorded in milliseconds
+        header(f'{p}_stage_duration_seconds', 'Wall time per ECGAnalyzer stage', 'histogram')
+        stage_snapshot = stage_histograms.snapshot()
+        for stage, snapshot in stage_snapshot.items():
+            histogram(f'{p}_stage_duration_seconds', ('stage',), (stage,), snapshot['wall_ms'], scale=0.001)
+
+        header(f'{p}_stage_cpu_seconds_total', 'CPU time per ECGAnalyzer stage', 'counter')
+        for stage, snapshot in stage_snapshot.items():
+            lines.append(f'{p}_stage_cpu_seconds_total{_labels(("stage",), (stage,))} {_format(snapshot["cpu_ms"]["sum"] / 1000)}')
+
+        for name, (help_text, callback) in list(self._gauges.items()):
+            header(f'{p}_{name}', help_text, 'gauge')
+            lines.append(f'{p}_{name} {_format(callback())}')
+
+        if cache_stats is not None:
+            for key, metric_type, help_text in (
+                ('hits', 'counter', 'Result cache hits'),
+                ('misses', 'counter', 'Result cache misses'),
+                ('evictions', 'counter', 'Result cache LRU evictions'),
+                ('expirations', 'counter', 'Result cache TTL expirations'),
+                ('entries', 'gauge', 'Result cache entries'),
+                ('bytes', 'gauge', 'Approximate result cache size in bytes')
+            ):
+                name = f'{p}_cache_{key}_total' if metric_type == 'counter' else f'{p}_cache_{key}'
+                header(name, help_text, metric_type)
+                lines.append(f'{name} {cache_stats[key]}')
+
+        header(f'{p}_process_resident_memory_bytes', 'Resident set size', 'gauge')
+        lines.append(f'{p}_process_resident_memory_bytes {process_rss_bytes()}')
+
+        header(f'{p}_process_start_time_seconds', 'Process start time (unix seconds)', 'gauge')
+        lines.append(f'{p}_process_start_time_seconds {_format(self.started_at)}')
+
+        return '\n'.join(lines) + '\n'
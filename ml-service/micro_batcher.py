@@ -0,0 +1,131 @@
+"""
+Micro-Batching Scheduler
+Runs concurrent single-session analysis requests through
+ECGAnalyzer.analyze_batch together, so simultaneous requests share one model
+call and, when they have the same sample rate and length, one filter pass.
+Each caller gets its own result back through a Future.
+
+Batches are formed greedily: a dispatcher takes every request queued while it
+was busy, so a lone request is not delayed. MICROBATCH_MAX_WAIT_MS adds an
+optional window to wait for more.
+
+Configuration (environment variables):
+- MICROBATCH_ENABLED: route /analyze through the batcher (default false)
+- MICROBATCH_MAX_WAIT_MS: how long to wait for more requests (default 0)
+- MICROBATCH_MAX_SIZE: largest batch (default 32)
+- MICROBATCH_MAX_QUEUE: queued requests before new ones are rejected (default 1024)
+- MICROBATCH_WORKERS: dispatcher threads (default: CPU count)
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+from instrumentation import StageTimer
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Raised when the micro-batch queue is at capacity"""
+
+class MicroBatcher:
+    """
+    Groups queued requests (plus any arriving within max_wait_ms, up to
+    max_batch_size) into one analyze_batch call
+    """
+
+    def __init__(self, analyzer, max_wait_ms=None, max_batch_size=None, max_queue=None, workers=None, on_batch=None):
+        self.analyzer = analyzer
+        self.enabled = os.environ.get('MICROBATCH_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else float(os.environ.get('MICROBATCH_MAX_WAIT_MS', 0))) / 1000
+        self.max_batch_size = max_batch_size or int(os.environ.get('MICROBATCH_MAX_SIZE', 32))
+        self.workers = workers or int(os.environ.get('MICROBATCH_WORKERS', os.cpu_count() or 1))
+        self.on_batch = on_batch
+
+        self._queue = queue.Queue(maxsize=max_queue or int(os.environ.get('MICROBATCH_MAX_QUEUE', 1024)))
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        """Start dispatcher threads on first use"""
+        if self._threads:
+            return
+        with self._lock:
+            if not self._threads:
+                for index in range(self.workers):
+                    thread = threading.Thread(target=self._run, name=f'micro-batcher-{index}', daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def submit(self, ecg_signal, sample_rate):
+        """Queue one session; returns a Future resolving to its analysis result"""
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((ecg_signal, sample_rate, future))
+        except queue.Full:
+            raise QueueFullError('Analysis queue is full, retry later')
+        return future
+
+    def analyze(self, ecg_signal, sample_rate, timeout=None):
+        """Blocking submit"""
+        return self.submit(ecg_signal, sample_rate).result(timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # Collect until the window closes or the batch is full
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    # Past the deadline, still take whatever is already queued
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch):
+        signals = [ecg_signal for ecg_signal, _, _ in batch]
+        sample_rates = [sample_rate for _, sample_rate, _ in batch]
+        futures = [future for _, _, future in batch]
+
+        if self.on_batch is not None:
+            self.on_batch(len(batch))
+
+        try:
+            results = self.analyzer.analyze_batch(signals, sample_rates, StageTimer())
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(batch)} failed: {str(e)}", exc_info=True)
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+    def close(self):
+        """Stop dispatcher threads after queued work is done"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
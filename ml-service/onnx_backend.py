@@ -0,0 +1,112 @@
+"""
+ONNX Runtime Backend
+Runs the arrhythmia classifier from an .onnx file with a tuned, per-process
+InferenceSession. Feature vectors of many sessions go through one batched
+run() call. Only onnxruntime is needed at inference time (no torch/sklearn).
+
+Configuration (environment variables):
+- ONNX_INTRA_OP_THREADS: threads inside one operator (default 1, 0 = all cores)
+- ONNX_INTER_OP_THREADS: threads across operators (default 1)
+- ONNX_GRAPH_OPTIMIZATION: disable, basic, extended or all (default all)
+"""
+
+import os
+import json
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One session per model file per process
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_classifier(model_path):
+    """Load an ONNX classifier once per process and reuse it"""
+    classifier = _sessions.get(model_path)
+    if classifier is None:
+        with _sessions_lock:
+            classifier = _sessions.get(model_path)
+            if classifier is None:
+                classifier = ONNXClassifier(model_path)
+                _sessions[model_path] = classifier
+    return classifier
+
+def _parse_metadata(value):
+    """JSON metadata value, or the raw string when it is not JSON"""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+class ONNXClassifier:
+    """
+    Batched classifier over an ONNX InferenceSession
+    Exposes predict_proba/classes_ like a scikit-learn classifier
+    """
+
+    GRAPH_OPTIMIZATION_LEVELS = {
+        'disable': 'ORT_DISABLE_ALL',
+        'basic': 'ORT_ENABLE_BASIC',
+        'extended': 'ORT_ENABLE_EXTENDED',
+        'all': 'ORT_ENABLE_ALL'
+    }
+
+    def __init__(self, model_path, intra_op_threads=None, inter_op_threads=None, graph_optimization=None):
+        import onnxruntime as ort
+
+        intra_op_threads = intra_op_threads if intra_op_threads is not None else int(os.environ.get('ONNX_INTRA_OP_THREADS', 1))
+        inter_op_threads = inter_op_threads if inter_op_threads is not None else int(os.environ.get('ONNX_INTER_OP_THREADS', 1))
+        graph_optimization = graph_optimization or os.environ.get('ONNX_GRAPH_OPTIMIZATION', 'all')
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = getattr(
+            ort.GraphOptimizationLevel,
+            self.GRAPH_OPTIMIZATION_LEVELS.get(graph_optimization, 'ORT_ENABLE_ALL')
+        )
+
+        logger.info(f"Loading ONNX classifier from {model_path} (intra={intra_op_threads}, inter={inter_op_threads})")
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+        inputs = self.session.get_inputs()
+        self.input_name = inputs[0].name
+        self.n_features = inputs[0].shape[1] if len(inputs[0].shape) == 2 and isinstance(inputs[0].shape[1], int) else None
+
+        # Probabilities are the output whose name mentions "prob", else the last one
+        outputs = [output.name for output in self.session.get_outputs()]
+        self.probability_output = next((name for name in outputs if 'prob' in name.lower()), outputs[-1])
+
+        # Metadata values are JSON (classes, feature_version, ... written by train_model.py --onnx)
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.metadata = {key: _parse_metadata(value) for key, value in metadata.items()}
+        self.classes_ = self.metadata.get('classes')
+        self.feature_version = self.metadata.get('feature_version')
+
+    def predict_proba(self, features):
+        """(n_sessions, n_features) -> (n_sessions, n_classes) in one run() call"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        probabilities = self.session.run([self.probability_output], {self.input_name: features})[0]
+
+        # skl2onnx emits a list of {class: probability} dicts unless zipmap is disabled
+        if isinstance(probabilities, list):
+            if self.classes_ is None:
+                self.classes_ = list(probabilities[0].keys())
+            probabilities = np.array([[row[label] for label in self.classes_] for row in probabilities], dtype=np.float32)
+
+        return np.asarray(probabilities)
+
+    def get_info(self):
+        return {
+            'backend': 'onnxruntime',
+            'path': self.model_path,
+            'input': self.input_name,
+            'n_features': self.n_features,
+            'feature_version': self.feature_version,
+            'classes': self.classes_
+        }
@@ -0,0 +1,135 @@
+"""
+Analysis Result Cache
+Content-addressed cache for ECGAnalyzer results: the key is a hash of the
+sample buffer, the sample rate and the analyzer version, so reopening the
+same session returns the stored result instead of re-running the pipeline.
+
+Configuration (environment variables):
+- CACHE_MAX_BYTES: approximate memory cap, 0 disables the cache (default 64 MB)
+- CACHE_TTL_SECONDS: entry lifetime (default 3600)
+"""
+
+import os
+import copy
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+class AnalysisCache:
+    """
+    LRU cache with a memory cap and TTL
+    Entry sizes are estimated from the JSON size of the result
+    """
+
+    def __init__(self, max_bytes=None, ttl_seconds=None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.environ.get('CACHE_TTL_SECONDS', 3600))
+
+        self._entries = OrderedDict()  # key -> (expires_at, size, result)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(ecg_signal, sample_rate, version):
+        """Hash of the sample buffer, sample rate and analyzer version"""
+        signal_array = np.ascontiguousarray(ecg_signal)
+        if signal_array.dtype == object:
+            signal_array = signal_array.astype(float)
+
+        digest = hashlib.sha256()
+        digest.update(f"{version}|{sample_rate}|{signal_array.dtype.str}|{signal_array.shape}".encode())
+        digest.update(memoryview(signal_array).cast('B'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return a copy of the cached result, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, size, result = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.current_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        # Callers add sessionId/timestamp, so never hand out the stored dict
+        return copy.deepcopy(result)
+
+    def put(self, key, result):
+        """Store a result, evicting least recently used entries over the memory cap"""
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+
+        result = copy.deepcopy(result)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, result)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, ecg_signal, sample_rate, version, compute):
+        """Cached compute(); error results are never stored"""
+        if not self.enabled:
+            return compute()
+
+        key = self.make_key(ecg_signal, sample_rate, version)
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        result = compute()
+        if result.get('analysis_type') != 'error':
+            self.put(key, result)
+        return result
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def get_stats(self):
+        """Counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'maxBytes': self.max_bytes,
+                'ttlSeconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0
+            }
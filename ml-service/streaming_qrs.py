@@ -0,0 +1,324 @@
+"""
+Streaming QRS Detector
+Causal Pan-Tompkins for live device feeds: chunks are pushed as they
+arrive and confirmed R-peaks are emitted incrementally
+
+Thresholds adapt the Pan-Tompkins way: every peak of the integrated signal
+updates either the signal or the noise level, and when no beat arrives within
+166% of the average R-R interval the strongest peak above the lower threshold
+is taken (search-back). If there is none the signal level decays, so the
+detector recovers after the QRS amplitude drops (electrode re-seat, posture).
+
+Configuration (environment variables):
+- STREAM_IDLE_TIMEOUT_SECONDS: streams without a push for this long are dropped (default 300)
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+from filter_bank import get_filter
+
+logger = logging.getLogger(__name__)
+
+class StreamingQRSDetector:
+    """
+    Stateful Pan-Tompkins QRS detector
+
+    Bandpass, derivative, squaring and moving window integration all keep
+    their state between push() calls, so the work done per chunk depends
+    only on the chunk size, never on how long the session has been running.
+    """
+
+    def __init__(self, sample_rate=250, learning_seconds=2.0):
+        self.sample_rate = sample_rate
+
+        # Bandpass filter (5-15 Hz) from the shared filter bank, same as ECGAnalyzer.preprocess
+        self._filter = get_filter(sample_rate)
+
+        # Causal filtering shifts the QRS; compensate with the group delay at the band centre
+        self.filter_delay = int(round(self._filter.group_delay(10)))
+
+        self.window_size = max(int(0.15 * sample_rate), 1)  # 150ms integration window
+        self.refractory = max(int(0.2 * sample_rate), 1)    # 200ms between beats
+        self.learning_samples = int(learning_seconds * sample_rate)
+
+        # Filtered samples kept for locating the R-peak behind an integrated peak
+        self._history_size = self.window_size + self.refractory
+
+        # Search-back interval before any R-R interval is known (1 s)
+        self.default_rr = sample_rate
+
+        self.reset()
+
+    def reset(self):
+        """Drop all state and start a new stream"""
+        self._zi = None
+        self._last_filtered = None
+        self._squared_tail = np.zeros(self.window_size - 1)
+        self._integrated_tail = np.zeros(0)
+        self._filtered_history = np.zeros(0)
+        self._learning_buffer = []
+
+        self.samples_seen = 0
+        self.signal_level = None  # SPKI
+        self.noise_level = None   # NPKI
+        self.threshold = None     # THRESHOLD I1; search-back uses half of it
+        self.peak_count = 0
+        self.last_peak = None
+        self.last_rr = None
+        self._rr_samples = deque(maxlen=8)
+
+        self._candidate = None  # (index, integrated value)
+        self._last_integrated = None
+        self._missed = []       # peaks between the two thresholds since the last beat
+        self._search_from = None
+
+    def push(self, chunk):
+        """
+        Feed new raw samples
+        Returns absolute sample indices of R-peaks confirmed by this chunk
+        """
+        chunk = np.asarray(chunk, dtype=float).ravel()
+        if chunk.size == 0:
+            return []
+
+        start = self.samples_seen
+        self.samples_seen += chunk.size
+
+        # Causal bandpass, initial state scaled to the first sample to avoid a startup step
+        if self._zi is None:
+            self._zi = self._filter.initial_state(chunk[0])
+        filtered, self._zi = self._filter.sosfilt(chunk, self._zi)
+
+        # Derivative (emphasize QRS slope)
+        previous = filtered[0] if self._last_filtered is None else self._last_filtered
+        diff = np.diff(filtered, prepend=previous)
+        self._last_filtered = filtered[-1]
+
+        # Squaring (amplify high frequencies)
+        squared = diff ** 2
+
+        # Moving window integration over the tail of the previous chunk
+        extended = np.concatenate((self._squared_tail, squared))
+        cumulative = np.cumsum(extended)
+        window_sums = cumulative[self.window_size - 1:] - np.concatenate(([0.0], cumulative[:-self.window_size]))
+        integrated = window_sums / self.window_size
+        self._squared_tail = extended[-(self.window_size - 1):] if self.window_size > 1 else extended[:0]
+
+        history_start = start - self._filtered_history.size
+        self._filtered_history = np.concatenate((self._filtered_history, filtered))
+
+        if self.threshold is None:
+            # Learning phase: history is kept until the threshold is known
+            confirmed = self._learn(integrated, history_start)
+        else:
+            confirmed = self._find_peaks(integrated, start, history_start)
+
+        if self.threshold is not None:
+            # Keep only what the R-peak search (including search-back) can still reach
+            keep = self._history_size
+            if self._missed:
+                keep = max(keep, self.samples_seen - self._missed[0][0] + self.window_size)
+            self._filtered_history = self._filtered_history[-keep:]
+
+        return confirmed
+
+    def _learn(self, integrated, history_start):
+        """Initial threshold from the first seconds of signal, then detect over them"""
+        self._learning_buffer.append(integrated)
+        if sum(part.size for part in self._learning_buffer) < self.learning_samples:
+            return []
+
+        learning = np.concatenate(self._learning_buffer)
+        self._learning_buffer = []
+        self.signal_level = float(np.max(learning))
+        self.noise_level = float(np.mean(learning))
+        self._update_threshold()
+        self._search_from = history_start
+
+        return self._find_peaks(learning, history_start, history_start)
+
+    def _update_threshold(self):
+        self.threshold = self.noise_level + 0.25 * (self.signal_level - self.noise_level)
+
+    def _find_peaks(self, integrated, start, history_start):
+        """
+        Classify local maxima of the integrated signal as QRS or noise
+        A QRS candidate is confirmed once the refractory period has passed without a higher one
+        """
+        confirmed = []
+
+        # Local maxima, continuing over the last two values of the previous chunk
+        extended = np.concatenate((self._integrated_tail, integrated))
+        offset = start - self._integrated_tail.size
+        middle = extended[1:-1]
+        peaks = np.flatnonzero((middle > extended[:-2]) & (middle >= extended[2:])) + 1
+        self._integrated_tail = extended[-2:]
+
+        for position in peaks:
+            index = offset + int(position)
+            confirmed += self._search_back(index, history_start)
+            if self._last_integrated is not None and index - self._last_integrated < self.refractory:
+                continue
+            value = float(extended[position])
+
+            if self._candidate is not None and index - self._candidate[0] >= self.refractory:
+                confirmed.append(self._confirm(history_start))
+
+            if value > self.threshold:
+                if self._candidate is None or value > self._candidate[1]:
+                    self._candidate = (index, value)
+            else:
+                # Noise peak (Pan-Tompkins NPKI); kept for search-back if above THRESHOLD I2
+                self.noise_level = 0.125 * value + 0.875 * self.noise_level
+                if value > 0.5 * self.threshold:
+                    self._missed.append((index, value))
+                self._update_threshold()
+
+        if self._candidate is not None and self.samples_seen - 1 - self._candidate[0] >= self.refractory:
+            confirmed.append(self._confirm(history_start))
+        confirmed += self._search_back(self.samples_seen - 1, history_start)
+
+        return confirmed
+
+    def _search_back(self, index, history_start):
+        """
+        Recover a missed beat once 166% of the average R-R interval has passed
+        Without a peak above THRESHOLD I2 the signal level is halved instead
+        """
+        if self._candidate is not None or self._search_from is None:
+            return []
+
+        rr_average = np.mean(self._rr_samples) if self._rr_samples else self.default_rr
+        if index - self._search_from <= 1.66 * rr_average:
+            return []
+
+        if self._missed:
+            self._candidate = max(self._missed, key=lambda peak: peak[1])
+            return [self._confirm(history_start, search_back=True)]
+
+        self.signal_level *= 0.5
+        self._update_threshold()
+        self._search_from = index
+        return []
+
+    def _confirm(self, history_start, search_back=False):
+        """Emit the pending candidate and adapt the threshold"""
+        index, value = self._candidate
+        self._candidate = None
+        self._last_integrated = index
+        self._search_from = index
+        self._missed = [peak for peak in self._missed if peak[0] - index >= self.refractory]
+
+        # Locate the R-peak in the filtered signal behind the integration window
+        search_start = max(index - self.window_size, history_start)
+        lo = search_start - history_start
+        hi = index - history_start + 1
+        segment = self._filtered_history[lo:hi]
+        r_peak = search_start + int(np.argmax(np.abs(segment))) if segment.size else index
+        r_peak = max(r_peak - self.filter_delay, 0)
+
+        if self.last_peak is not None and r_peak <= self.last_peak:
+            r_peak = self.last_peak + 1
+
+        # Running signal level estimate (Pan-Tompkins SPKI); search-back beats weigh more
+        weight = 0.25 if search_back else 0.125
+        self.signal_level = weight * value + (1 - weight) * self.signal_level
+        self._update_threshold()
+
+        if self.last_peak is not None:
+            self._rr_samples.append(r_peak - self.last_peak)
+            self.last_rr = (r_peak - self.last_peak) / self.sample_rate
+        self.last_peak = r_peak
+        self.peak_count += 1
+
+        return r_peak
+
+    def heart_rate(self):
+        """Instantaneous heart rate (BPM) from the last R-R interval"""
+        if not self.last_rr:
+            return 0
+        return 60 / self.last_rr
+
+class StreamSession:
+    """One live stream: its detector, guarded by its own lock so pushes are applied in order"""
+
+    def __init__(self, sample_rate):
+        self.detector = StreamingQRSDetector(sample_rate)
+        self.lock = threading.Lock()
+        self.last_active = time.monotonic()
+
+class StreamSessions:
+    """
+    Open live streams by session id
+    Streams are closed explicitly, or dropped once idle for longer than the timeout,
+    so devices that disconnect without closing do not leak their detector. Pushes
+    sweep for idle streams at most once per EXPIRY_INTERVAL_SECONDS, so a chunk's cost
+    does not grow with the number of connected devices.
+    """
+
+    # Longest gap between idle sweeps (shorter if the idle timeout is)
+    EXPIRY_INTERVAL_SECONDS = 30
+
+    def __init__(self, idle_timeout=None):
+        self.idle_timeout = idle_timeout if idle_timeout is not None else float(os.environ.get('STREAM_IDLE_TIMEOUT_SECONDS', 300))
+        self.expiry_interval = min(self.EXPIRY_INTERVAL_SECONDS, self.idle_timeout)
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._next_expiry = time.monotonic() + self.expiry_interval
+
+    def push(self, session_id, samples, sample_rate):
+        """
+        Feed samples to the session's detector, starting a new stream if there is none
+        or the sample rate changed
+        Returns (confirmed R-peaks, samples processed, heart rate)
+        """
+        now = time.monotonic()
+        if now >= self._next_expiry:
+            self.expire()
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.detector.sample_rate != sample_rate:
+                session = StreamSession(sample_rate)
+                self._sessions[session_id] = session
+            session.last_active = now
+
+        with session.lock:
+            detector = session.detector
+            r_peaks = detector.push(samples)
+            return r_peaks, detector.samples_seen, detector.heart_rate()
+
+    def close(self, session_id):
+        """Drop a stream; returns its detector, or None if unknown"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return None
+
+        # Wait for an in-flight push so the final counts include it
+        with session.lock:
+            return session.detector
+
+    def expire(self):
+        """Drop streams idle for longer than the timeout"""
+        now = time.monotonic()
+        cutoff = now - self.idle_timeout
+        with self._lock:
+            self._next_expiry = now + self.expiry_interval
+            expired = [session_id for session_id, session in self._sessions.items() if session.last_active < cutoff]
+            for session_id in expired:
+                del self._sessions[session_id]
+        if expired:
+            logger.info(f"Dropped {len(expired)} idle stream sessions")
+
+    def active(self):
+        """Number of open streams"""
+        self.expire()
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,297 @@
+"""
+HeartWise Model Training
+Offline training of the arrhythmia classifier from a directory of labelled
+recordings. Features are built by parallel worker processes through the same
+batched pipeline and feature module used at inference, the random forest is
+fitted with all cores, and the result is saved as a versioned, uncompressed
+joblib artifact (plus an optional ONNX export). Serving processes share one
+copy of the forest only through MODEL_PRELOAD with forked workers; memory-
+mapping the artifact does not share the tree nodes (see README).
+
+Labels come from a CSV (--labels, columns: file,label[,sample_rate]) or, without
+one, from the name of each recording's parent directory (data/<label>/*.npy).
+
+Usage:
+    python train_model.py data/ --sample-rate 250 --output models/ecg_rf.joblib
+    python train_model.py data/ --labels labels.csv --workers 16 --n-estimators 300
+    python train_model.py data/ --output models/ecg_rf.joblib --onnx models/ecg_rf.onnx
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from features import FEATURE_NAMES, FEATURE_VERSION, N_FEATURES
+
+logger = logging.getLogger(__name__)
+
+# Layout of the saved artifact; bump when its keys change
+ARTIFACT_VERSION = 1
+
+RECORDING_EXTENSIONS = ('.npy', '.raw', '.bin', '.dat')
+
+# Analyzer owned by each feature worker process
+_worker_analyzer = None
+
+def _init_worker():
+    global _worker_analyzer
+
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+    from ecg_analyzer import ECGAnalyzer
+    _worker_analyzer = ECGAnalyzer()
+
+def _feature_chunk(items, dtype, lead):
+    """
+    Feature rows for a chunk of (path, sample_rate) recordings
+    Returns (matrix, errors); failed recordings are NaN rows
+    """
+    analyzer = _worker_analyzer
+    matrix = np.full((len(items), len(FEATURE_NAMES)), np.nan, dtype=np.float32)
+    errors = [None] * len(items)
+
+    loaded = []
+    signals = []
+    for index, (path, _) in enumerate(items):
+        try:
+            signals.append(np.array(analyzer.open_recording(path, dtype, lead), dtype=float))
+            loaded.append(index)
+        except Exception as e:
+            errors[index] = str(e)
+
+    if loaded:
+        rows, results = analyzer.feature_matrix(signals, [items[index][1] for index in loaded])
+        matrix[loaded] = rows
+        for index, result in zip(loaded, results):
+            if result.get('analysis_type') == 'error':
+                errors[index] = result['details'].get('error')
+
+    return matrix, errors
+
+def find_recordings(data_dir, labels_path=None, sample_rate=250):
+    """List of (path, sample_rate, label)"""
+    if labels_path:
+        recordings = []
+        with open(labels_path, newline='') as f:
+            for row in csv.DictReader(f):
+                path = row['file'] if os.path.isabs(row['file']) else os.path.join(data_dir, row['file'])
+                rate = int(row['sample_rate']) if row.get('sample_rate') else sample_rate
+                recordings.append((path, rate, row['label']))
+        return recordings
+
+    recordings = []
+    for root, _, files in os.walk(data_dir):
+        if os.path.abspath(root) == os.path.abspath(data_dir):
+            continue
+        label = os.path.basename(root)
+        for name in sorted(files):
+            if name.endswith(RECORDING_EXTENSIONS):
+                recordings.append((os.path.join(root, name), sample_rate, label))
+    return sorted(recordings)
+
+def build_features(recordings, workers=None, chunk_size=64, dtype='int16', lead=0):
+    """
+    (n_recordings, N_FEATURES) matrix built across worker processes
+    Recordings are sorted by size so each chunk filters same-length signals together
+    """
+    order = sorted(range(len(recordings)), key=lambda index: (recordings[index][1], _file_size(recordings[index][0])))
+    chunks = [order[start:start + chunk_size] for start in range(0, len(order), chunk_size)]
+
+    matrix = np.full((len(recordings), len(FEATURE_NAMES)), np.nan, dtype=np.float32)
+    errors = [None] * len(recordings)
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [
+            executor.submit(_feature_chunk, [recordings[index][:2] for index in chunk], dtype, lead)
+            for chunk in chunks
+        ]
+        for number, (chunk, future) in enumerate(zip(chunks, futures), start=1):
+            rows, chunk_errors = future.result()
+            matrix[chunk] = rows
+            for index, error in zip(chunk, chunk_errors):
+                errors[index] = error
+            if number % 50 == 0 or number == len(chunks):
+                logger.info(f"Features: {min(number * chunk_size, len(recordings))}/{len(recordings)} recordings")
+
+    return matrix, errors
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def train(features, labels, n_estimators=200, n_jobs=-1, test_size=0.2, random_state=0, max_depth=None):
+    """Fit the random forest; returns (model, metrics)"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import accuracy_score, f1_score
+
+    metrics = {}
+    if test_size and len(set(labels)) > 1:
+        stratify = labels if min(np.unique(labels, return_counts=True)[1]) > 1 else None
+        train_x, test_x, train_y, test_y = train_test_split(
+            features, labels, test_size=test_size, random_state=random_state, stratify=stratify
+        )
+    else:
+        train_x, train_y, test_x, test_y = features, labels, None, None
+
+    model = RandomForestClassifier(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        n_jobs=n_jobs,
+        class_weight='balanced',
+        random_state=random_state
+    )
+    model.fit(train_x, train_y)
+
+    if test_x is not None and len(test_x):
+        predicted = model.predict(test_x)
+        metrics = {
+            'test_samples': int(len(test_y)),
+            'accuracy': round(float(accuracy_score(test_y, predicted)), 4),
+            'macro_f1': round(float(f1_score(test_y, predicted, average='macro')), 4)
+        }
+
+    # Serving is one request at a time per worker; don't fan out threads there
+    model.set_params(n_jobs=None)
+    return model, metrics
+
+def save_artifact(model, path, metadata):
+    """Uncompressed joblib dump (loads without a decompression pass)"""
+    import joblib
+
+    artifact = dict(metadata)
+    artifact.update({
+        'artifact_version': ARTIFACT_VERSION,
+        'feature_version': FEATURE_VERSION,
+        'feature_names': FEATURE_NAMES,
+        'classes': [str(label) for label in model.classes_],
+        'model': model
+    })
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Write then rename, so serving processes never load a half-written file
+    temporary = f'{path}.tmp'
+    joblib.dump(artifact, temporary, compress=0)
+    os.replace(temporary, path)
+
+def export_onnx(model, path, metadata):
+    """
+    ONNX conversion for the onnxruntime backend (needs skl2onnx)
+    Outputs plain probabilities (no zipmap); the artifact fields are stored as JSON model metadata
+    """
+    from skl2onnx import to_onnx
+    from skl2onnx.common.data_types import FloatTensorType
+
+    # Opsets onnxruntime 1.16 runs
+    onnx_model = to_onnx(
+        model,
+        initial_types=[('features', FloatTensorType([None, N_FEATURES]))],
+        options={id(model): {'zipmap': False}},
+        target_opset={'': 17, 'ai.onnx.ml': 3}
+    )
+
+    fields = dict(metadata)
+    fields.update({
+        'artifact_version': ARTIFACT_VERSION,
+        'feature_version': FEATURE_VERSION,
+        'feature_names': FEATURE_NAMES,
+        'classes': [str(label) for label in model.classes_]
+    })
+    for key, value in fields.items():
+        entry = onnx_model.metadata_props.add()
+        entry.key, entry.value = key, json.dumps(value)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+    os.replace(temporary, path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the ECG arrhythmia classifier')
+    parser.add_argument('data_dir', help='directory of recordings (one subdirectory per label without --labels)')
+    parser.add_argument('--labels', help='CSV with file,label[,sample_rate] columns')
+    parser.add_argument('--sample-rate', type=int, default=250, help='sample rate in Hz when not in the labels CSV')
+    parser.add_argument('--dtype', default='int16', choices=['int16', 'float32', 'float64'], help='sample type of raw files')
+    parser.add_argument('--lead', type=int, default=0, help='lead index for 2-D (leads, samples) .npy files')
+    parser.add_argument('--workers', type=int, default=None, help='feature worker processes (default: all cores)')
+    parser.add_argument('--chunk-size', type=int, default=64, help='recordings per worker task')
+    parser.add_argument('--n-estimators', type=int, default=200, help='trees in the forest')
+    parser.add_argument('--max-depth', type=int, default=None, help='maximum tree depth')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='threads used to fit the forest (-1: all cores)')
+    parser.add_argument('--test-size', type=float, default=0.2, help='held-out fraction for the reported metrics')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--output', default='models/ecg_classifier.joblib', help='artifact path')
+    parser.add_argument('--onnx', help='also export the model to this .onnx path (needs skl2onnx)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    recordings = find_recordings(args.data_dir, args.labels, args.sample_rate)
+    if not recordings:
+        logger.error(f"No labelled recordings found in {args.data_dir}")
+        return 1
+    logger.info(f"Found {len(recordings)} recordings in {len(set(label for _, _, label in recordings))} classes")
+
+    started = time.perf_counter()
+    features, errors = build_features(recordings, args.workers, args.chunk_size, args.dtype, args.lead)
+    feature_seconds = time.perf_counter() - started
+
+    valid = ~np.isnan(features).any(axis=1)
+    skipped = int((~valid).sum())
+    if skipped:
+        first = next(error for error, ok in zip(errors, valid) if not ok)
+        logger.warning(f"Skipped {skipped} recordings that could not be analyzed (first error: {first})")
+    if not valid.any():
+        logger.error("No usable recordings")
+        return 1
+
+    labels = np.array([label for _, _, label in recordings])[valid]
+    logger.info(f"Built {int(valid.sum())} feature vectors in {feature_seconds:.1f}s")
+
+    started = time.perf_counter()
+    model, metrics = train(
+        features[valid], labels, args.n_estimators, args.n_jobs, args.test_size, args.seed, args.max_depth
+    )
+    fit_seconds = time.perf_counter() - started
+    logger.info(f"Fitted {args.n_estimators} trees in {fit_seconds:.1f}s {json.dumps(metrics)}")
+
+    metadata = {
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'training_samples': int(valid.sum()),
+        'skipped_recordings': skipped,
+        'metrics': metrics,
+        'params': {'n_estimators': args.n_estimators, 'max_depth': args.max_depth, 'seed': args.seed},
+        'timings': {'features_seconds': round(feature_seconds, 1), 'fit_seconds': round(fit_seconds, 1)}
+    }
+    save_artifact(model, args.output, metadata)
+    logger.info(f"Saved model artifact to {args.output}")
+
+    if args.onnx:
+        export_onnx(model, args.onnx, metadata)
+        logger.info(f"Exported ONNX model to {args.onnx}")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())